@@ -0,0 +1,299 @@
+"""Assignment 0 - Weather benchmarks
+
+CSC148, Winter 2021
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, Ian Berlott-Atwell, Jonathan Calver,
+Sophia Huynh, Maryam Majedi, and Jaisie Sin.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2021 Diane Horton, Ian Berlott-Atwell, Jonathan Calver,
+Sophia Huynh, Maryam Majedi, and Jaisie Sin.
+
+===== Module Description =====
+
+This module times the code in weather.py on synthetic data written by
+generator.py. Run it directly to print the results.
+
+run_suite times loading, every statistic and the summary report at several
+scales and saves the results as JSON, so that a later run can be compared
+against them with compare_results to spot regressions.
+"""
+from datetime import date
+from random import Random
+from typing import Callable, Dict, List, Optional, Tuple
+import json
+import os
+import platform
+import tempfile
+import time
+
+from generator import generate_country, generate_station
+from weather import Country, DailyWeather, HistoricalWeather, load_data, \
+    load_country
+
+# The (stations, years) of each scale that run_suite measures by default.
+SCALES = ((4, 10), (16, 20), (64, 20))
+
+
+def benchmark_load_data(years: int = 50, repeats: int = 3) -> None:
+    """Print how many rows per second load_data parses from a synthetic
+    station file covering <years> years, with and without columnar storage.
+
+    The best of <repeats> runs is reported for each storage mode.
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        filename = os.path.join(folder, 'station.csv')
+        rows = generate_station(filename, 'SYNTHETIC', (43.7, -79.4),
+                                years=years)
+        for columnar in [False, True]:
+            best = float('inf')
+            for _ in range(repeats):
+                with open(filename, 'r') as f:
+                    start = time.perf_counter()
+                    load_data(f, columnar)
+                    best = min(best, time.perf_counter() - start)
+            mode = 'columnar' if columnar else 'records'
+            print(f'load_data ({mode}, {years} years): '
+                  f'{rows / best:,.0f} rows/sec')
+
+
+def benchmark_load_country(stations: int = 32, years: int = 20,
+                           max_workers: int = 0) -> None:
+    """Print how long load_country takes to load a folder of <stations>
+    synthetic station files covering <years> years each, using 1, 2, 4, ...
+    worker processes, up to <max_workers>, with dict and with columnar
+    storage.
+
+    With dict storage the speedup is capped at about 2x, as explained in
+    load_country.
+
+    If <max_workers> is 0, go up to the number of CPUs on this machine.
+    """
+    if max_workers == 0:
+        max_workers = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as folder:
+        generate_country(folder, stations, years)
+        for columnar in (False, True):
+            storage = 'columnar' if columnar else 'dict'
+            workers = 1
+            serial = 0.0
+            while workers <= max_workers:
+                start = time.perf_counter()
+                load_country(folder, 'Synthetica', workers, columnar)
+                elapsed = time.perf_counter() - start
+                if workers == 1:
+                    serial = elapsed
+                print(f'load_country ({stations} stations, {storage}, '
+                      f'{workers} workers): {elapsed:.2f}s, '
+                      f'speedup {serial / elapsed:.1f}x')
+                workers *= 2
+
+
+def benchmark_numpy(sizes: tuple = (10_000, 100_000, 1_000_000)) -> None:
+    """Print how long each HistoricalWeather statistic takes on a history
+    with each number of days in <sizes>, computed by the methods of
+    HistoricalWeather and by weather_numpy.ArrayStatistics.
+
+    The time for ArrayStatistics includes converting the history to arrays.
+    Nothing is timed if NumPy is not installed.
+    """
+    try:
+        from weather_numpy import ArrayStatistics
+    except ImportError:
+        print('NumPy is not installed; skipping benchmark_numpy')
+        return
+    for size in sizes:
+        history = _synthetic_history(size)
+        start = time.perf_counter()
+        stats = ArrayStatistics(history)
+        print(f'{size:>9,} days: convert to arrays '
+              f'{time.perf_counter() - start:.4f}s')
+        for name in ['record_high', 'monthly_average',
+                     'contiguous_precipitation', 'percentage_snowfall']:
+            args = (12, 25) if name == 'record_high' else ()
+            # A fresh history each time, so no cached result is reused.
+            loops = _time(getattr(_synthetic_history(size), name), args)
+            vectorized = _time(getattr(stats, name), args)
+            print(f'{size:>9,} days: {name:<24} loops {loops:.4f}s, '
+                  f'numpy {vectorized:.4f}s')
+
+
+def run_suite(scales: Tuple[Tuple[int, int], ...] = SCALES,
+              repeats: int = 3) -> Dict[str, object]:
+    """Return how long load_country, each HistoricalWeather statistic and
+    generate_summary take on a synthetic Country at each (stations, years)
+    in <scales>.
+
+    Each time is the best of <repeats> runs, in seconds. A statistic's time
+    is the total over all stations, with cached results discarded first.
+    generate_summary is timed through Country.write_summary, which writes the
+    same report.md, so that the report goes to a temporary folder.
+
+    The result maps 'python' and 'platform' to descriptions of where the
+    suite ran, and 'results' to a dictionary mapping each scale, written as
+    '<stations>x<years>', to the times measured at that scale.
+    """
+    results = {}
+    for stations, years in scales:
+        with tempfile.TemporaryDirectory() as folder:
+            data = os.path.join(folder, 'data')
+            generate_country(data, stations, years)
+            times = {'load_country': _best(load_country, (data, 'Synthetica'),
+                                           repeats)}
+            country = load_country(data, 'Synthetica')
+            histories = [country.retrieve_history(f'STATION {i}')
+                         for i in range(stations)]
+            for name, args in _STATISTICS:
+                times[name] = _best(_time_statistic, (histories, name, args),
+                                    repeats, True)
+            report = os.path.join(folder, 'report.md')
+            times['generate_summary'] = _best(_time_summary,
+                                              (country, report), repeats,
+                                              True)
+        results[f'{stations}x{years}'] = times
+    return {'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results}
+
+
+def compare_results(baseline: Dict[str, object], current: Dict[str, object],
+                    tolerance: float = 0.2) -> List[str]:
+    """Return a line describing each time in <current> that is more than
+    <tolerance> (as a fraction) slower than the same time in <baseline>.
+
+    Both are results returned by run_suite. Times measured in only one of
+    them are ignored.
+
+    >>> before = {'results': {'4x10': {'load_country': 1.0,
+    ...                                'record_high': 0.5}}}
+    >>> after = {'results': {'4x10': {'load_country': 1.5,
+    ...                               'record_high': 0.5}}}
+    >>> compare_results(before, after)
+    ['4x10 load_country: 1.0000s -> 1.5000s (+50%)']
+    """
+    regressions = []
+    for scale, times in current['results'].items():
+        old_times = baseline['results'].get(scale, {})
+        for name, seconds in times.items():
+            old = old_times.get(name)
+            if old and seconds > old * (1 + tolerance):
+                regressions.append(f'{scale} {name}: {old:.4f}s -> '
+                                   f'{seconds:.4f}s '
+                                   f'(+{seconds / old - 1:.0%})')
+    return regressions
+
+
+def save_results(results: Dict[str, object], filename: str) -> None:
+    """Write <results>, as returned by run_suite, to the JSON file called
+    <filename>.
+    """
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(filename: str) -> Optional[Dict[str, object]]:
+    """Return the results saved by save_results in the file called
+    <filename>, or None if there is no such file.
+    """
+    if not os.path.exists(filename):
+        return None
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+# The name and arguments of each HistoricalWeather statistic run_suite times.
+_STATISTICS = (('record_high', (12, 25)),
+               ('monthly_average', ()),
+               ('contiguous_precipitation', ()),
+               ('longest_precipitation_streaks', (10,)),
+               ('percentage_snowfall', ()),
+               ('rolling_statistics', (30, 'precipitation')))
+
+
+def _time_statistic(histories: List[HistoricalWeather], name: str,
+                    args: tuple) -> float:
+    """Return how many seconds it takes to compute the statistic called
+    <name>, with <args>, for every history in <histories>, discarding any
+    cached results first.
+
+    A statistic that is a generator is run to the end.
+    """
+    for history in histories:
+        history._changed()
+    start = time.perf_counter()
+    for history in histories:
+        result = getattr(history, name)(*args)
+        if name == 'rolling_statistics':
+            for _ in result:
+                pass
+    return time.perf_counter() - start
+
+
+def _time_summary(country: Country, filename: str) -> float:
+    """Return how many seconds it takes <country> to write its summary
+    report to the file called <filename>, with every row computed afresh.
+    """
+    country._summary_rows.clear()
+    for history in country._histories.values():
+        history._changed()
+    return _time(country.write_summary, (filename,))
+
+
+def _best(function: Callable, args: tuple, repeats: int,
+          timed: bool = False) -> float:
+    """Return the shortest time, in seconds, of <repeats> calls of function
+    with args.
+
+    If <timed> is True, function returns its own time, which is used instead
+    of the time of the whole call.
+    """
+    if timed:
+        return min(function(*args) for _ in range(repeats))
+    return min(_time(function, args) for _ in range(repeats))
+
+
+def _synthetic_history(days: int) -> HistoricalWeather:
+    """Return a columnar history of <days> consecutive days of random
+    weather, starting on Jan 1 of year 1.
+    """
+    rng = Random(days)
+    history = HistoricalWeather('SYNTHETIC', (43.7, -79.4), columnar=True)
+    first = date(1, 1, 1).toordinal()
+    for ordinal in range(first, first + days):
+        mean = rng.uniform(-20, 30)
+        precipitation = rng.choice([0.0, 0.0, -1.0, rng.uniform(0, 20)])
+        history.add_weather(date.fromordinal(ordinal),
+                            DailyWeather.from_values(
+                                mean, mean - 5, mean + 5, precipitation,
+                                precipitation if mean > 0 else 0.0,
+                                precipitation if mean <= 0 else 0.0))
+    return history
+
+
+def _time(function: Callable, args: tuple) -> float:
+    """Return how many seconds it takes to call function with args."""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    benchmark_load_data()
+    benchmark_load_country()
+    benchmark_numpy()
+
+    previous = load_results('benchmark_results.json')
+    suite = run_suite()
+    for scale_name, scale_times in suite['results'].items():
+        for statistic, elapsed in scale_times.items():
+            print(f'{scale_name:>6} {statistic:<30} {elapsed:.4f}s')
+    if previous is not None:
+        for line in compare_results(previous, suite) or ['no regressions']:
+            print(line)
+    save_results(suite, 'benchmark_results.json')
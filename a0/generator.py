@@ -0,0 +1,135 @@
+"""Assignment 0 - Synthetic weather data generator
+
+CSC148, Winter 2021
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, Ian Berlott-Atwell, Jonathan Calver,
+Sophia Huynh, Maryam Majedi, and Jaisie Sin.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2021 Diane Horton, Ian Berlott-Atwell, Jonathan Calver,
+Sophia Huynh, Maryam Majedi, and Jaisie Sin.
+
+===== Module Description =====
+
+This module writes synthetic daily weather data for a station, or a whole
+folder of stations, to csv files in the format described in the handout, so
+that weather.py can be measured against much longer histories and many more
+locations than the ones in student_data.
+
+The values are plausible rather than realistic: temperatures follow a yearly
+cycle, and some days have missing data or trace amounts of precipitation.
+"""
+from datetime import date, timedelta
+from random import Random
+from typing import Tuple
+import math
+import os
+
+# The header line of every data file.
+HEADER = ('Longitude (x),Latitude (y),Station Name,Climate ID,Date/Time,Year,'
+          'Month,Day,Data Quality,Max Temp (°C),Max Temp Flag,Min Temp (°C),'
+          'Min Temp Flag,Mean Temp (°C),Mean Temp Flag,Heat Deg Days (°C),'
+          'Heat Deg Days Flag,Cool Deg Days (°C),Cool Deg Days Flag,'
+          'Total Rain (mm),Total Rain Flag,Total Snow (cm),Total Snow Flag,'
+          'Total Precip (mm),Total Precip Flag,Snow on Grnd (cm),'
+          'Snow on Grnd Flag,Dir of Max Gust (10s deg),Dir of Max Gust Flag,'
+          'Spd of Max Gust (km/h),Spd of Max Gust Flag')
+
+
+def generate_station(filename: str, name: str,
+                     coordinates: Tuple[float, float],
+                     start_year: int = 1970, years: int = 50,
+                     missing_rate: float = 0.02, trace_rate: float = 0.05,
+                     seed: int = 0) -> int:
+    """Write <years> years of daily weather for the station called <name>,
+    starting on Jan 1 of <start_year>, to the file <filename>. Return the
+    number of rows of data written.
+
+    On each day, with probability <missing_rate> one of the precipitation
+    values is flagged as missing, and with probability <trace_rate> one of
+    them is recorded as a trace amount.
+
+    Preconditions:
+        - years >= 0
+        - 0 <= missing_rate <= 1 and 0 <= trace_rate <= 1
+    """
+    rng = Random(seed)
+    lat, lon = coordinates
+    day = date(start_year, 1, 1)
+    end = date(start_year + years, 1, 1)
+    one_day = timedelta(days=1)
+    rows = 0
+    with open(filename, 'w') as file:
+        file.write(HEADER + '\n')
+        while day < end:
+            season = math.cos(2 * math.pi * (day.timetuple().tm_yday - 200)
+                              / 365)
+            mean = round(5 + 15 * season + rng.gauss(0, 3), 1)
+            low = round(mean - rng.uniform(0, 8), 1)
+            high = round(mean + rng.uniform(0, 8), 1)
+            precip = [0.0, 0.0, 0.0]
+            if rng.random() < 0.4:
+                amount = round(rng.expovariate(0.3), 1)
+                if mean < 0:
+                    precip = [amount, 0.0, amount]
+                else:
+                    precip = [amount, amount, 0.0]
+            flags = ['', '', '']
+            if rng.random() < missing_rate:
+                flags[rng.randrange(3)] = 'M'
+            elif rng.random() < trace_rate:
+                flags[rng.randrange(3)] = 'T'
+                precip = [0.0, 0.0, 0.0]
+            total, rain, snow = precip
+            file.write(
+                f'{lon},{lat},{name},{seed},{day.month}/{day.day}/{day.year},'
+                f'{day.year},{day.month},{day.day},,{high},,{low},,{mean},,'
+                f',,,,{rain},{flags[1]},{snow},{flags[2]},{total},{flags[0]},'
+                f',,,M,,M\n')
+            rows += 1
+            day += one_day
+    return rows
+
+
+def generate_country(folder_name: str, stations: int, years: int = 50,
+                     start_year: int = 1970, missing_rate: float = 0.02,
+                     trace_rate: float = 0.05, seed: int = 0) -> int:
+    """Write <stations> station files, each covering <years> years starting
+    on Jan 1 of <start_year>, to the folder called <folder_name>, creating it
+    if needed. Return the total number of rows of data written.
+
+    Station i is called STATION i, is written to stationi.csv, and uses the
+    seed <seed> + i, so the same arguments always give the same files. The
+    stations are scattered over the part of the map between latitudes 42 and
+    70 and longitudes -140 and -52.
+
+    Preconditions:
+        - stations >= 0
+        - the preconditions of generate_station hold
+    """
+    os.makedirs(folder_name, exist_ok=True)
+    rng = Random(seed)
+    rows = 0
+    for i in range(stations):
+        coordinates = (round(rng.uniform(42, 70), 4),
+                       round(rng.uniform(-140, -52), 4))
+        rows += generate_station(os.path.join(folder_name, f'station{i}.csv'),
+                                 f'STATION {i}', coordinates, start_year,
+                                 years, missing_rate, trace_rate, seed + i)
+    return rows
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-io': ['generate_station'],
+        'allowed-import-modules': ['doctest', 'python_ta', 'typing',
+                                   'datetime', 'random', 'math', 'os'],
+    })
+    generate_station('synthetic_station.csv', 'SYNTHETIC', (43.7, -79.4))
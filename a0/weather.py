@@ -16,9 +16,29 @@ Copyright (c) 2021 Diane Horton, Ian Berlott-Atwell, Jonathan Calver,
 Sophia Huynh, Maryam Majedi, and Jaisie Sin.
 """
 
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import date, timedelta
-from typing import Tuple, Dict, Optional, TextIO, Union
+from itertools import chain, islice, repeat
+from operator import itemgetter
+from typing import Tuple, Callable, Collection, Dict, Iterable, Iterator, \
+    List, Optional, Sequence, TextIO, Union, BinaryIO
+import asyncio
+import contextvars
+import csv
+import hashlib
+import heapq
+import io
+import json
+import locale
+import math
+import mmap
 import os
+import struct
+import threading
+import time
 
 # The column numbers where each kind of information appears.  For example,
 # column 9 contains maximum temperature.
@@ -38,10 +58,179 @@ SNOW_ON_GRND, SNOW_ON_GRND_FLAG = 25, 26
 DIR_MAX_GUST, DIR_MAX_GUST_FLAG = 27, 28
 SPD_MAX_GUST, SPD_MAX_GUST_FLAG = 29, 30
 
+# Identifies a station written by _write_station, and the version of its
+# layout. Change this whenever the layout changes.
+_STATION_MAGIC = b'WTHRST01'
+# The fixed-size start of a station written by _write_station: the magic
+# bytes, the size and modification time (in ns) of the data file the station
+# was parsed from, latitude, longitude, number of rows, and the length of the
+# station name in bytes.
+_STATION_HEADER = struct.Struct('=8sqqddqq')
+
+# Identifies a country written by Country.save_packed, and the version of its
+# layout. Change this whenever the layout changes.
+_COUNTRY_MAGIC = b'WTHRCT01'
+# The fixed-size start of a country written by Country.save_packed: the magic
+# bytes, the number of stations, and the length of the country name in bytes.
+_COUNTRY_HEADER = struct.Struct('=8sqq')
+
+# The width and height, in degrees, of the cells of the grid that Country uses
+# to find locations by their coordinates.
+_GRID_DEGREES = 1.0
+# The number of grid cells around each line of latitude.
+_GRID_COLUMNS = round(360 / _GRID_DEGREES)
+# The mean radius of the Earth, in km.
+_EARTH_RADIUS_KM = 6371.0
+
+# Picks out, from a row of a data file, just the columns that load_data uses.
+_PROJECT_ROW = itemgetter(STN_NAME, YEAR, MONTH, DAY,
+                          MEAN_TEMP, MIN_TEMP, MAX_TEMP,
+                          TOTAL_PRECIP, TOTAL_PRECIP_FLAG,
+                          TOTAL_RAIN, TOTAL_RAIN_FLAG,
+                          TOTAL_SNOW, TOTAL_SNOW_FLAG)
+
+
+class Profile:
+    """Timers and counters for the stages of loading weather data and
+    computing statistics from it.
+
+    Nothing is recorded unless a Profile is active. Inside a with statement
+    on a Profile, the functions and methods of this module record how long
+    each stage took and how much work it did into that Profile. The active
+    Profile is kept in a context variable, so it only applies to the thread
+    or asyncio task that entered it, and to the threads WeatherRegistry runs
+    its queries in. Work done in worker processes, when load_country is
+    given workers > 1, is not recorded, apart from the time spent waiting
+    for it.
+
+    The stages are:
+        read_rows: splitting the lines of data files into columns
+        parse_days: checking flags and building DailyWeather objects
+        insert_days: adding the parsed days to a HistoricalWeather
+        load_country: all of load_country
+        statistics: computing the rows of a summary
+        write_summary: all of Country.write_summary
+
+    The counters are:
+        rows_read: rows of data files looked at by load_data
+        rows_rejected_flag: rows skipped because of a missing-data flag
+        rows_rejected_value: rows skipped because a value was missing
+        rows_inserted: days added to a HistoricalWeather for the first time
+        stations_loaded: locations returned by load_country
+        cache_hits: data files read from load_country's cache
+        stats_computed: statistics computed by HistoricalWeather, not
+            counting ones returned from its cache
+        summary_rows_computed: rows of a summary that were computed
+        summary_rows_cached: rows of a summary that were still up to date
+
+    === Instance Attributes ===
+    timings: For each stage that has run, the total seconds spent in it.
+    calls: For each stage that has run, how many times it ran.
+    counters: For each counter that has been counted, its total.
+
+    === Private Attributes ===
+    _token: The token for restoring the Profile that was active before this
+        one became active, or None if this one is not active.
+    _lock: Held while recording, so that several threads can record into
+        this Profile at once.
+
+    === Sample Usage ===
+    >>> import io
+    >>> f = io.StringIO(
+    ...     'header\\n'
+    ...     '79.5,43.7,YORK,1,,2019,12,24,,3,,-2,,0.5,,,,,,0,,1,,1,,,,,,,\\n'
+    ...     '79.5,43.7,YORK,1,,2019,12,25,,3,,-2,,0.5,,,,,,0,M,1,,1,,,,,,,\\n')
+    >>> with Profile() as profile:
+    ...     york = load_data(f)
+    >>> profile.counters['rows_read'], profile.counters['rows_inserted']
+    (2, 1)
+    >>> profile.summary()['counters']['rows_rejected_flag']
+    1
+    >>> sorted(profile.summary()['stages'])
+    ['insert_days', 'parse_days', 'read_rows']
+    """
+    timings: Dict[str, float]
+    calls: Dict[str, int]
+    counters: Dict[str, int]
+    _token: Optional[contextvars.Token]
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        """Initialize this Profile with nothing recorded.
+        """
+        self.timings = {}
+        self.calls = {}
+        self.counters = {}
+        self._token = None
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'Profile':
+        """Make this the active Profile, and return it.
+        """
+        self._token = _active_profile.set(self)
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Make the Profile that was active before this one active again.
+        """
+        _active_profile.reset(self._token)
+        self._token = None
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        """Record that the stage called stage ran once, taking seconds.
+        """
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def count(self, counter: str, amount: int = 1) -> None:
+        """Add amount to the counter called counter.
+        """
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def summary(self) -> Dict[str, Dict[str, object]]:
+        """Return everything recorded in this Profile, in a form that can be
+        written out with json.dump.
+
+        The result maps 'stages' to a dictionary giving the seconds and calls
+        of each stage, and 'counters' to a copy of counters.
+        """
+        return {'stages': {stage: {'seconds': self.timings[stage],
+                                   'calls': self.calls[stage]}
+                           for stage in self.timings},
+                'counters': dict(self.counters)}
+
+    def __str__(self) -> str:
+        """Return a table of the stages and counters in this Profile.
+
+        >>> profile = Profile()
+        >>> profile.add_time('parse_days', 0.25)
+        >>> profile.count('rows_read', 3)
+        >>> print(profile)
+        parse_days                   0.250000 s in 1 calls
+        rows_read                           3
+        """
+        lines = [f'{stage : <24} {self.timings[stage] : >12.6f} s in '
+                 f'{self.calls[stage]} calls' for stage in self.timings]
+        lines.extend(f'{counter : <24} {self.counters[counter] : >12}'
+                     for counter in self.counters)
+        return '\n'.join(lines)
+
+
+# The Profile recording into, or None if instrumentation is off.
+_active_profile = contextvars.ContextVar('_active_profile', default=None)
+# How many rows load_data reads at a time while a Profile is active.
+_PROFILE_CHUNK_ROWS = 4096
+
 
 class DailyWeather:
     """Weather facts for a single day.
 
+    DailyWeather objects are immutable, and store their attributes in slots
+    rather than a per-instance dict, since a loaded country holds millions
+    of them.
+
     === Instance Attributes ===
     avg_temp: Average temperature on this day, in degrees Celsius
     low_temp: Minimum temperature on this day, in Celsius
@@ -69,7 +258,12 @@ class DailyWeather:
     20.3
     >>> print(weather.precipitation)
     5
+    >>> weather.avg_temp = 0
+    Traceback (most recent call last):
+    AttributeError: DailyWeather is immutable
     """
+    __slots__ = ('avg_temp', 'low_temp', 'high_temp', 'precipitation',
+                 'snowfall', 'rainfall')
     avg_temp: float
     low_temp: float
     high_temp: float
@@ -99,12 +293,63 @@ class DailyWeather:
         >>> print(weather.avg_temp)
         13.1
         """
-        self.avg_temp = temperature_statistics[0]
-        self.low_temp = temperature_statistics[1]
-        self.high_temp = temperature_statistics[2]
-        self.precipitation = precipitation_statistics[0]
-        self.rainfall = precipitation_statistics[1]
-        self.snowfall = precipitation_statistics[2]
+        _set = object.__setattr__
+        _set(self, 'avg_temp', temperature_statistics[0])
+        _set(self, 'low_temp', temperature_statistics[1])
+        _set(self, 'high_temp', temperature_statistics[2])
+        _set(self, 'precipitation', precipitation_statistics[0])
+        _set(self, 'rainfall', precipitation_statistics[1])
+        _set(self, 'snowfall', precipitation_statistics[2])
+
+    @classmethod
+    def from_values(cls, avg_temp: float, low_temp: float, high_temp: float,
+                    precipitation: float, rainfall: float,
+                    snowfall: float) -> 'DailyWeather':
+        """Return a new DailyWeather with these values.
+
+        This is equivalent to
+            DailyWeather((avg_temp, low_temp, high_temp),
+                         (precipitation, rainfall, snowfall))
+        but does not build the two tuples, which matters when loading
+        millions of days.
+
+        Preconditions: as for __init__
+
+        >>> weather = DailyWeather.from_values(13.1, 9.2, 20.3, 5, 0, 1)
+        >>> print(weather)
+        Average: 13.1 Low: 9.2 High: 20.3 Precipitation: 5 Snow: 1 Rain: 0
+        """
+        w = object.__new__(cls)
+        (set_avg, set_low, set_high,
+         set_precip, set_rain, set_snow) = _SLOT_SETTERS
+        set_avg(w, avg_temp)
+        set_low(w, low_temp)
+        set_high(w, high_temp)
+        set_precip(w, precipitation)
+        set_rain(w, rainfall)
+        set_snow(w, snowfall)
+        return w
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Refuse to change this DailyWeather, since it is immutable."""
+        raise AttributeError('DailyWeather is immutable')
+
+    def __delattr__(self, name: str) -> None:
+        """Refuse to change this DailyWeather, since it is immutable."""
+        raise AttributeError('DailyWeather is immutable')
+
+    def __reduce__(self) -> Tuple[object, Tuple[float, ...]]:
+        """Return how to rebuild this DailyWeather when it is pickled, for
+        example to send it to another process.
+
+        >>> import pickle
+        >>> weather = DailyWeather((1, 0, 2), (3, 2, 1))
+        >>> print(pickle.loads(pickle.dumps(weather)))
+        Average: 1 Low: 0 High: 2 Precipitation: 3 Snow: 1 Rain: 2
+        """
+        return (DailyWeather.from_values,
+                (self.avg_temp, self.low_temp, self.high_temp,
+                 self.precipitation, self.rainfall, self.snowfall))
     # Note: We will just test that the string returned includes the 6 values,
     # We will not test the full content or format of the string.
 
@@ -122,6 +367,470 @@ class DailyWeather:
                + ' Rain: ' + str(self.rainfall)
 
 
+# The __set__ methods of the slots of DailyWeather, in the order taken by
+# DailyWeather.from_values. Calling these directly is much faster than going
+# through object.__setattr__, which DailyWeather.__setattr__ forces otherwise.
+_SLOT_SETTERS = tuple(getattr(DailyWeather, attribute).__set__
+                      for attribute in ['avg_temp', 'low_temp', 'high_temp',
+                                        'precipitation', 'rainfall',
+                                        'snowfall'])
+
+
+# The names of the columns of _WeatherColumns that hold DailyWeather values.
+_COLUMN_NAMES = ('avg_temp', 'low_temp', 'high_temp', 'precipitation',
+                 'rainfall', 'snowfall')
+
+
+class _WeatherColumns:
+    """Compact, array-backed storage for the daily weather at one place.
+
+    Each recorded day is one row spread across parallel arrays of machine
+    numbers, so a day costs about 50 bytes rather than a DailyWeather object,
+    its attribute dict and a dict entry keyed by date. Rows are kept in date
+    order.
+
+    The columns may instead be read-only memoryviews into a memory-mapped
+    file (see from_buffer). They are then copied into arrays the first time
+    a row is inserted.
+
+    === Attributes ===
+    ordinals: The ordinal (as given by date.toordinal) of the day stored in
+        each row.
+    avg_temp, low_temp, high_temp, precipitation, rainfall, snowfall:
+        The value of the DailyWeather attribute of the same name for the day
+        stored in each row.
+
+    === Representation Invariants ===
+    - All of the arrays have the same length.
+    - ordinals is strictly increasing.
+    """
+    ordinals: Union[array, memoryview]
+    avg_temp: Union[array, memoryview]
+    low_temp: Union[array, memoryview]
+    high_temp: Union[array, memoryview]
+    precipitation: Union[array, memoryview]
+    rainfall: Union[array, memoryview]
+    snowfall: Union[array, memoryview]
+
+    def __init__(self) -> None:
+        """Initialize these columns with no rows."""
+        self.ordinals = array('i')
+        self.avg_temp = array('d')
+        self.low_temp = array('d')
+        self.high_temp = array('d')
+        self.precipitation = array('d')
+        self.rainfall = array('d')
+        self.snowfall = array('d')
+
+    @classmethod
+    def from_buffer(cls, buffer: memoryview, offset: int, rows: int,
+                    copy: bool) -> Tuple['_WeatherColumns', int]:
+        """Return the columns with this many rows laid out as _write_station
+        lays them out starting at offset in buffer, along with the offset just
+        past them.
+
+        If copy is False, the columns are views of buffer rather than copies,
+        so nothing is read from buffer until the values are used.
+
+        Raise ValueError if buffer ends before the columns do.
+        """
+        columns = cls()
+        for column in ('ordinals',) + _COLUMN_NAMES:
+            typecode = getattr(columns, column).typecode
+            end = offset + getattr(columns, column).itemsize * rows
+            if end > len(buffer):
+                raise ValueError('columns are truncated')
+            if copy:
+                getattr(columns, column).frombytes(buffer[offset:end])
+            else:
+                setattr(columns, column, buffer[offset:end].cast(typecode))
+            offset = end + _padding(end)
+        return (columns, offset)
+
+    def __getstate__(self) -> Dict[str, array]:
+        """Return the state to pickle for these columns.
+
+        Views of a memory-mapped file cannot be pickled, so they are copied
+        into arrays.
+        """
+        return {column: _as_array(getattr(self, column))
+                for column in ('ordinals',) + _COLUMN_NAMES}
+
+    def _ensure_writable(self) -> None:
+        """Copy these columns into arrays if they are memoryviews."""
+        if not isinstance(self.ordinals, array):
+            for column in ('ordinals',) + _COLUMN_NAMES:
+                setattr(self, column, _as_array(getattr(self, column)))
+
+    def __len__(self) -> int:
+        """Return the number of rows in these columns."""
+        return len(self.ordinals)
+
+    def find(self, ordinal: int) -> int:
+        """Return the row holding the day with this ordinal, or -1 if that
+        day has not been stored.
+
+        >>> columns = _WeatherColumns()
+        >>> columns.insert(10, DailyWeather((1, 0, 2), (0, 0, 0)))
+        True
+        >>> columns.find(10), columns.find(11)
+        (0, -1)
+        """
+        i = bisect_left(self.ordinals, ordinal)
+        if i < len(self.ordinals) and self.ordinals[i] == ordinal:
+            return i
+        return -1
+
+    def insert(self, ordinal: int, w: DailyWeather) -> bool:
+        """Store w as the weather for the day with this ordinal and return
+        True. If that day already has a row, do nothing and return False.
+
+        >>> columns = _WeatherColumns()
+        >>> columns.insert(12, DailyWeather((1, 0, 2), (0, 0, 0)))
+        True
+        >>> columns.insert(10, DailyWeather((5, 4, 6), (0, 0, 0)))
+        True
+        >>> columns.insert(12, DailyWeather((9, 9, 9), (0, 0, 0)))
+        False
+        >>> list(columns.ordinals), list(columns.avg_temp)
+        ([10, 12], [5.0, 1.0])
+        """
+        self._ensure_writable()
+        i = len(self.ordinals)
+        # Data files are in date order, so appending is the common case.
+        if i > 0 and self.ordinals[-1] >= ordinal:
+            i = bisect_left(self.ordinals, ordinal)
+            if self.ordinals[i] == ordinal:
+                return False
+        self.ordinals.insert(i, ordinal)
+        self.avg_temp.insert(i, w.avg_temp)
+        self.low_temp.insert(i, w.low_temp)
+        self.high_temp.insert(i, w.high_temp)
+        self.precipitation.insert(i, w.precipitation)
+        self.rainfall.insert(i, w.rainfall)
+        self.snowfall.insert(i, w.snowfall)
+        return True
+
+    def merge(self, ordinals: Sequence[int],
+              values: Sequence[Sequence[float]]) -> List[int]:
+        """Store the rows whose days have the ordinals in ordinals and whose
+        values are in values, one sequence for each name in _COLUMN_NAMES in
+        that order. Skip any row whose day is already stored, or appears
+        earlier in ordinals. Return the indices into ordinals of the rows
+        stored, in increasing order.
+
+        If the rows stored all come after the rows already here, in order,
+        they are appended; otherwise the columns are sorted once at the end.
+
+        >>> columns = _WeatherColumns()
+        >>> columns.insert(12, DailyWeather((1, 0, 2), (0, 0, 0)))
+        True
+        >>> columns.merge([13, 10, 12, 13], [[5, 6, 7, 8]] + [[0] * 4] * 5)
+        [0, 1]
+        >>> list(columns.ordinals), list(columns.avg_temp)
+        ([10, 12, 13], [6.0, 1.0, 5.0])
+        """
+        self._ensure_writable()
+        stored = self.ordinals
+        latest = stored[-1] if len(stored) > 0 else -math.inf
+        # Only needed, and so only built, once a row is out of order.
+        seen = None
+        in_order = True
+        kept = []
+        for i, ordinal in enumerate(ordinals):
+            if ordinal > latest:
+                latest = ordinal
+            else:
+                if seen is None:
+                    seen = {ordinals[j] for j in kept}
+                if ordinal in seen or self.find(ordinal) != -1:
+                    continue
+                in_order = False
+            if seen is not None:
+                seen.add(ordinal)
+            kept.append(i)
+        if in_order:
+            stored.extend(ordinals[i] for i in kept)
+            for name, column in zip(_COLUMN_NAMES, values):
+                getattr(self, name).extend(column[i] for i in kept)
+            return kept
+        merged = list(stored)
+        merged.extend(ordinals[i] for i in kept)
+        order = sorted(range(len(merged)), key=merged.__getitem__)
+        self.ordinals = array('i', [merged[j] for j in order])
+        for name, column in zip(_COLUMN_NAMES, values):
+            merged = list(getattr(self, name))
+            merged.extend(column[i] for i in kept)
+            setattr(self, name, array('d', [merged[j] for j in order]))
+        return kept
+
+    def items(self) -> Iterator[Tuple[date, DailyWeather]]:
+        """Yield the date and a new DailyWeather for every row, in order."""
+        for row, ordinal in enumerate(self.ordinals):
+            yield (date.fromordinal(ordinal), self.weather_at(row))
+
+    def weather_at(self, row: int) -> DailyWeather:
+        """Return a new DailyWeather holding the values stored in this row.
+        """
+        return DailyWeather.from_values(
+            self.avg_temp[row], self.low_temp[row], self.high_temp[row],
+            self.precipitation[row], self.rainfall[row], self.snowfall[row])
+
+
+def _as_array(values: Union[array, memoryview]) -> array:
+    """Return values if it is an array, or else a new array holding a copy of
+    the values in the memoryview values.
+    """
+    if isinstance(values, array):
+        return values
+    copied = array(values.format)
+    copied.frombytes(values.cast('B'))
+    return copied
+
+
+# The months of each season, in the order they happen. December is counted in
+# the winter of the following year, so the winter of 2020 runs from
+# December 2019 to February 2020.
+SEASONS = {'Winter': (12, 1, 2), 'Spring': (3, 4, 5), 'Summer': (6, 7, 8),
+           'Fall': (9, 10, 11)}
+
+
+class Rollup:
+    """A summary of the temperatures and precipitation on a set of days.
+
+    Rollups of disjoint sets of days can be merged into a rollup of all of
+    them without looking at the days again, which is how HistoricalWeather
+    answers yearly and seasonal queries from its per-month rollups.
+
+    Trace amounts of precipitation and snowfall count as 0.
+
+    === Instance Attributes ===
+    days: The number of days summarized.
+    low_total: The sum of the minimum temperatures of those days.
+    lowest: The lowest minimum temperature of those days.
+    high_total: The sum of the maximum temperatures of those days.
+    highest: The highest maximum temperature of those days.
+    precipitation: The total precipitation on those days.
+    snowfall: The total snowfall on those days.
+
+    === Representation Invariants ===
+    - days >= 0
+    - if days == 0, then low_total, high_total, precipitation and snowfall
+      are 0, lowest is inf and highest is -inf
+
+    === Sample Usage ===
+    >>> july = Rollup()
+    >>> july.add(15, 28, 3, 0)
+    >>> july.add(17, 30, -1, 0)
+    >>> july.mean_high()
+    29.0
+    >>> august = Rollup()
+    >>> august.add(12, 25, 6, 0)
+    >>> summer = Rollup()
+    >>> summer.merge(july)
+    >>> summer.merge(august)
+    >>> summer.days, summer.lowest, summer.highest, summer.precipitation
+    (3, 12, 30, 9)
+    """
+    __slots__ = ('days', 'low_total', 'lowest', 'high_total', 'highest',
+                 'precipitation', 'snowfall')
+    days: int
+    low_total: float
+    lowest: float
+    high_total: float
+    highest: float
+    precipitation: float
+    snowfall: float
+
+    def __init__(self) -> None:
+        """Initialize this Rollup to summarize no days.
+        """
+        self.days = 0
+        self.low_total = 0
+        self.lowest = math.inf
+        self.high_total = 0
+        self.highest = -math.inf
+        self.precipitation = 0
+        self.snowfall = 0
+
+    def add(self, low_temp: float, high_temp: float, precipitation: float,
+            snowfall: float) -> None:
+        """Add one day, with these temperatures and amounts, to the days
+        this Rollup summarizes.
+        """
+        self.days += 1
+        self.low_total += low_temp
+        if low_temp < self.lowest:
+            self.lowest = low_temp
+        self.high_total += high_temp
+        if high_temp > self.highest:
+            self.highest = high_temp
+        if precipitation > 0:
+            self.precipitation += precipitation
+        if snowfall > 0:
+            self.snowfall += snowfall
+
+    def merge(self, other: 'Rollup') -> None:
+        """Add the days summarized by other to the days this Rollup
+        summarizes.
+
+        Precondition: other and this Rollup summarize no days in common.
+        """
+        self.days += other.days
+        self.low_total += other.low_total
+        self.lowest = min(self.lowest, other.lowest)
+        self.high_total += other.high_total
+        self.highest = max(self.highest, other.highest)
+        self.precipitation += other.precipitation
+        self.snowfall += other.snowfall
+
+    def mean_low(self) -> Optional[float]:
+        """Return the average minimum temperature of the days summarized, or
+        None if there are none.
+        """
+        if self.days == 0:
+            return None
+        return self.low_total / self.days
+
+    def mean_high(self) -> Optional[float]:
+        """Return the average maximum temperature of the days summarized, or
+        None if there are none.
+        """
+        if self.days == 0:
+            return None
+        return self.high_total / self.days
+
+
+class Histogram:
+    """A count of values in fixed-width buckets, from which percentiles can
+    be estimated without keeping the values themselves.
+
+    Histograms with the same buckets can be merged, so the distribution of a
+    set of values can be built from the histograms of its parts. Values
+    below the first bucket are counted in the first bucket, and values above
+    the last bucket in the last bucket.
+
+    === Instance Attributes ===
+    low: The lowest value of the first bucket.
+    width: The width of each bucket.
+    count: The number of values counted.
+    minimum: The smallest value counted, or inf if there are none.
+    maximum: The largest value counted, or -inf if there are none.
+
+    === Private Attributes ===
+    _counts: The number of values counted in each bucket. Bucket i holds
+        values from low + i * width up to, but not including,
+        low + (i + 1) * width.
+
+    === Representation Invariants ===
+    - width > 0
+    - count == sum(_counts)
+
+    === Sample Usage ===
+    >>> histogram = Histogram(0, 1, 10)
+    >>> for value in [1.5, 2.5, 2.5, 3.5, 9.5]:
+    ...     histogram.add(value)
+    >>> histogram.percentile(50)
+    2.5
+    >>> other = Histogram(0, 1, 10)
+    >>> other.add(8.25)
+    >>> histogram.merge(other)
+    >>> histogram.count, histogram.percentile(100)
+    (6, 9.5)
+    """
+    __slots__ = ('low', 'width', 'count', 'minimum', 'maximum', '_counts')
+    low: float
+    width: float
+    count: int
+    minimum: float
+    maximum: float
+    _counts: array
+
+    def __init__(self, low: float, width: float, buckets: int) -> None:
+        """Initialize this Histogram with buckets buckets of width width,
+        starting at low, and no values counted.
+
+        Preconditions:
+        - width > 0
+        - buckets >= 1
+        """
+        self.low = low
+        self.width = width
+        self.count = 0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self._counts = array('I', bytes(4 * buckets))
+
+    def add(self, value: float) -> None:
+        """Count value in this Histogram.
+        """
+        bucket = int((value - self.low) // self.width)
+        if bucket < 0:
+            bucket = 0
+        elif bucket >= len(self._counts):
+            bucket = len(self._counts) - 1
+        self._counts[bucket] += 1
+        self.count += 1
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other: 'Histogram') -> None:
+        """Count the values counted by other in this Histogram as well.
+
+        Precondition: other has the same low, width and number of buckets as
+            this Histogram.
+        """
+        counts = self._counts
+        for bucket, n in enumerate(other._counts):
+            if n:
+                counts[bucket] += n
+        self.count += other.count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return an estimate of the value that q percent of the values
+        counted are at most, or None if no values have been counted.
+
+        The estimate assumes the values in each bucket are spread evenly
+        across it, so it is within one bucket width of the true value, and it
+        is never outside the range of values counted.
+
+        Precondition: 0 <= q <= 100
+        """
+        if self.count == 0:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket, n in enumerate(self._counts):
+            if n and seen + n >= rank:
+                # The k-th of the n values in this bucket is taken to be
+                # (k - 0.5) / n of the way across it.
+                offset = max(rank - seen - 0.5, 0) / n
+                estimate = self.low + self.width * (bucket + offset)
+                return min(max(estimate, self.minimum), self.maximum)
+            seen += n
+        return self.maximum
+
+
+# The DailyWeather attributes that HistoricalWeather keeps a Histogram of for
+# each month, in the order of its sketches, with the low, width and number of
+# buckets of that Histogram. Buckets are centred on whole degrees and on 0
+# precipitation, which are common values. Trace precipitation is counted as 0.
+_SKETCHES = (('low_temp', -70.5, 1.0, 131),
+             ('high_temp', -70.5, 1.0, 131),
+             ('precipitation', -0.25, 0.5, 201))
+
+
+def _new_sketches() -> Tuple[Histogram, ...]:
+    """Return an empty Histogram for each attribute in _SKETCHES, in order.
+    """
+    return tuple(Histogram(low, width, buckets)
+                 for _, low, width, buckets in _SKETCHES)
+
+
 class HistoricalWeather:
     """A record of historical weather information for a fixed place on Earth.
 
@@ -130,14 +839,50 @@ class HistoricalWeather:
     coordinates: The latitude and longitude of this place.
 
     === Private Attributes ===
-    _records: The daily weather records for this place. Each key is a
-        date and its value is the location's weather on that day. There may
-        be gaps in the data. For example, there could be data for Jan 1, 2020
-        and Jan 5, 2020, but not for the days in between.
+    _records: The daily weather records for this place. Each key is the
+        ordinal of a date (see date.toordinal) and its value is the
+        location's weather on that day. There may be gaps in the data. For
+        example, there could be data for Jan 1, 2020 and Jan 5, 2020, but not
+        for the days in between. Integer keys are smaller and cheaper to hash
+        and compare than dates; dates are only built when they are returned.
+    _days: Every key of _records, in increasing order. This lets range
+        queries bisect to the relevant slice of the history instead of
+        scanning every record.
+    _columns: The compact columnar storage holding this place's daily
+        weather, or None if it is stored in _records and _days instead.
+    _highs: The highest temperature recorded on each (month, day), in any
+        year. Only days that have been recorded appear as keys.
+    _low_totals: The sum of the minimum temperatures recorded in each month,
+        in any year. Index 0 is January and index 11 is December.
+    _low_counts: The number of days recorded in each month, in any year,
+        indexed as in _low_totals.
+    _rollups: A Rollup of the days recorded in each (year, month). Only
+        months with at least one day recorded appear as keys.
+    _sketches: For each month (1-12) with at least one day recorded, in any
+        year, a Histogram of the values of each attribute in _SKETCHES on the
+        days recorded in that month, in the order of _SKETCHES. This is None
+        until it is first needed, so that loading data does not pay for it
+        unless it is used; after that it is kept up to date as weather is
+        added.
+    _aggregated: Whether _highs, _low_totals, _low_counts and _rollups have
+        been built. This is False only after _use_columns has taken columns
+        that have not been queried or added to since, so that opening a
+        packed file does not look at every day.
+    _version: The number of times weather has been added to this place.
+        Anything computed from this place's weather is out of date once
+        _version changes.
+    _stats: Statistics already computed for this place since weather was
+        last added to it. Each key is the name of the method that computed
+        the statistic, and its value is what that method returned.
 
     === Representation Invariants ===
     - coordinates[0] is a valid latitude (between -90 and 90)
     - coordinates[1] is a valid longitude (between -180 and 180)
+    - _days contains exactly the keys of _records, in increasing order
+    - if _columns is not None, then _records and _days are empty
+    - _highs, _low_totals, _low_counts and _rollups summarize exactly the
+      recorded days if _aggregated is True, and are empty otherwise
+    - _sketches summarizes exactly the recorded days unless it is None
 
     === Sample Usage ===
     >>> weather = DailyWeather((13, 9, 20), (5, 0, 0))
@@ -152,21 +897,52 @@ class HistoricalWeather:
     """
     name: str
     coordinates: Tuple[float, float]
-    _records: Dict[date, DailyWeather]
-
-    def __init__(self, name: str, coordinates: Tuple[float, float]) -> None:
+    _records: Dict[int, DailyWeather]
+    _days: List[int]
+    _columns: Optional[_WeatherColumns]
+    _highs: Dict[Tuple[int, int], float]
+    _low_totals: List[float]
+    _low_counts: List[int]
+    _rollups: Dict[Tuple[int, int], Rollup]
+    _sketches: Optional[Dict[int, Tuple[Histogram, ...]]]
+    _aggregated: bool
+    _version: int
+    _stats: Dict[str, object]
+
+    def __init__(self, name: str, coordinates: Tuple[float, float],
+                 columnar: bool = False) -> None:
         """Initialize this historical weather record with these coordinates,
         place name, and no recorded weather so far.
 
+        If columnar is True, store the daily weather in compact parallel
+        arrays rather than one DailyWeather object per day. This uses far
+        less memory for long histories, but retrieve_weather then returns a
+        new DailyWeather built from the stored values on every call, so
+        changing it does not change what is recorded.
+
         >>> weather = DailyWeather((13, 9, 20), (5, 0, 0))
         >>> toronto_weather = HistoricalWeather('Toronto', (43.6529, -79.3849))
         >>> toronto_weather.add_weather(date.today(), weather)
         >>> print(toronto_weather.name)
         Toronto
+        >>> compact = HistoricalWeather('Toronto', (43.6529, -79.3849), True)
+        >>> compact.add_weather(date.today(), weather)
+        >>> print(compact.retrieve_weather(date.today()).avg_temp)
+        13.0
         """
         self.name = name
         self.coordinates = coordinates
         self._records = {}
+        self._days = []
+        self._columns = _WeatherColumns() if columnar else None
+        self._highs = {}
+        self._low_totals = [0.0] * 12
+        self._low_counts = [0] * 12
+        self._rollups = {}
+        self._sketches = None
+        self._aggregated = True
+        self._version = 0
+        self._stats = {}
 
     # We will not test this method, but we recommend that you write and use it.
     def __str__(self) -> str:
@@ -180,8 +956,8 @@ class HistoricalWeather:
         2020-07-13: Average: 13 Low: 9 High: 20 Precipitation: 5 Snow: 0 Rain: 0
         """
         a = ''
-        for d in self._records:
-            a += str(d) + ':' + ' ' + str(self._records[d]) + '\n'
+        for d, weather in self._iter_records():
+            a += str(d) + ':' + ' ' + str(weather) + '\n'
         return self.name + ' ' + str(self.coordinates) + ':' + '\n' + a
 
     def add_weather(self, d: date, w: DailyWeather) -> None:
@@ -196,10 +972,231 @@ class HistoricalWeather:
         >>> print(toronto_weather.retrieve_weather(date.today()).avg_temp)
         13
         """
-        if d in self._records:
+        if self._columns is not None:
+            self._ensure_aggregates()
+            if self._columns.insert(d.toordinal(), w):
+                self._update_aggregates(d, w.low_temp, w.high_temp,
+                                        w.precipitation, w.snowfall)
+                self._changed()
+                profile = _active_profile.get()
+                if profile is not None:
+                    profile.count('rows_inserted')
+        elif d.toordinal() in self._records:
             pass
         else:
-            self._records[d] = w
+            ordinal = d.toordinal()
+            self._records[ordinal] = w
+            # Data files are in date order, so appending is the common case.
+            if not self._days or self._days[-1] < ordinal:
+                self._days.append(ordinal)
+            else:
+                insort(self._days, ordinal)
+            self._update_aggregates(d, w.low_temp, w.high_temp,
+                                    w.precipitation, w.snowfall)
+            self._changed()
+            profile = _active_profile.get()
+            if profile is not None:
+                profile.count('rows_inserted')
+
+    def add_weather_many(self, days: Union[Iterable[Tuple[date,
+                                                          DailyWeather]],
+                                           Dict[str, Sequence]]) -> int:
+        """Record the weather on many days at once, exactly as if add_weather
+        were called on each day in turn, and return how many days were
+        recorded that had not been recorded before.
+
+        days is either an iterable of (date, weather) pairs, or columns: a
+        dictionary mapping 'date' to a sequence of dates, or 'ordinal' to a
+        sequence of their ordinals (see date.toordinal), and each of
+        'avg_temp', 'low_temp', 'high_temp', 'precipitation', 'rainfall' and
+        'snowfall' to a sequence of the values of that DailyWeather
+        attribute on those days, in the same order.
+
+        As with add_weather, the first weather given for a day wins, whether
+        it was recorded earlier or earlier in days. Duplicates are removed in
+        the same pass that adds the days, and the date index is sorted or
+        merged once for the whole batch rather than once per day. Columns are
+        stored without building a DailyWeather per day when this place uses
+        columnar storage.
+
+        >>> toronto_weather = HistoricalWeather('Toronto', (43.6529, -79.3849))
+        >>> toronto_weather.add_weather_many([
+        ...     (date(2020, 7, 2), DailyWeather((20, 15, 25), (0, 0, 0))),
+        ...     (date(2020, 7, 1), DailyWeather((18, 12, 22), (0, 0, 0))),
+        ...     (date(2020, 7, 2), DailyWeather((30, 30, 30), (0, 0, 0)))])
+        2
+        >>> toronto_weather.add_weather_many({
+        ...     'date': [date(2020, 7, 3), date(2020, 7, 1)],
+        ...     'avg_temp': [21, 0], 'low_temp': [16, 0], 'high_temp': [27, 0],
+        ...     'precipitation': [0, 0], 'rainfall': [0, 0],
+        ...     'snowfall': [0, 0]})
+        1
+        >>> [(str(d), w.high_temp) for d, w in
+        ...  toronto_weather.records_between(date(2020, 7, 1),
+        ...                                  date(2020, 7, 3))]
+        [('2020-07-01', 22), ('2020-07-02', 25), ('2020-07-03', 27)]
+        """
+        size = len(self._columns if self._columns is not None
+                   else self._records)
+        if isinstance(days, dict):
+            if 'ordinal' in days:
+                ordinals = days['ordinal']
+            else:
+                ordinals = [d.toordinal() for d in days['date']]
+            values = [days[name] for name in _COLUMN_NAMES]
+            if self._columns is not None:
+                self._merge_columns(ordinals, values)
+            else:
+                new_weather = DailyWeather.from_values
+                self._extend(
+                    (date.fromordinal(ordinal), new_weather(*row))
+                    for ordinal, row in zip(ordinals, zip(*values)))
+        else:
+            self._extend(days)
+        return len(self._columns if self._columns is not None
+                   else self._records) - size
+
+    def _extend(self, days: Iterable[Tuple[date, DailyWeather]]) -> int:
+        """Record each (date, weather) pair in days, exactly as if
+        add_weather were called on each pair in turn, and return how many
+        pairs there were.
+
+        This is faster than calling add_weather repeatedly: the date index
+        is sorted once at the end if days were not in date order.
+        """
+        count = 0
+        update = self._update_aggregates
+        if self._columns is not None:
+            ordinals = []
+            values = ([], [], [], [], [], [])
+            (avg_temps, low_temps, high_temps, precipitations, rainfalls,
+             snowfalls) = values
+            for d, w in days:
+                ordinals.append(d.toordinal())
+                avg_temps.append(w.avg_temp)
+                low_temps.append(w.low_temp)
+                high_temps.append(w.high_temp)
+                precipitations.append(w.precipitation)
+                rainfalls.append(w.rainfall)
+                snowfalls.append(w.snowfall)
+            self._merge_columns(ordinals, values)
+            return len(ordinals)
+        size = len(self._records)
+        records = self._records
+        ordinals = self._days
+        in_order = True
+        for d, w in days:
+            count += 1
+            ordinal = d.toordinal()
+            if ordinal not in records:
+                if ordinals and ordinals[-1] > ordinal:
+                    in_order = False
+                records[ordinal] = w
+                ordinals.append(ordinal)
+                update(d, w.low_temp, w.high_temp, w.precipitation,
+                       w.snowfall)
+        if not in_order:
+            ordinals.sort()
+        if len(records) > size:
+            self._changed()
+            profile = _active_profile.get()
+            if profile is not None:
+                profile.count('rows_inserted', len(records) - size)
+        return count
+
+    def _merge_columns(self, ordinals: Sequence[int],
+                       values: Sequence[Sequence[float]]) -> None:
+        """Record the days given by ordinals and values, as described in
+        _WeatherColumns.merge, in this place's columnar storage.
+
+        Precondition: This place uses columnar storage.
+        """
+        self._ensure_aggregates()
+        kept = self._columns.merge(ordinals, values)
+        if not kept:
+            return
+        update = self._update_aggregates
+        _, low_temps, high_temps, precipitations, _, snowfalls = values
+        for i in kept:
+            update(date.fromordinal(ordinals[i]), low_temps[i], high_temps[i],
+                   precipitations[i], snowfalls[i])
+        self._changed()
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.count('rows_inserted', len(kept))
+
+    def _changed(self) -> None:
+        """Record that weather has just been added to this place, so that
+        statistics computed before now are out of date.
+        """
+        self._version += 1
+        self._stats.clear()
+
+    def _update_aggregates(self, d: date, low_temp: float, high_temp: float,
+                           precipitation: float, snowfall: float) -> None:
+        """Fold the weather recorded on the date d, which had these
+        temperatures and amounts, into the per-day and per-month aggregates,
+        the rollup of its year and month and, if they have been built, the
+        sketches of its month.
+
+        This takes the values themselves rather than a DailyWeather so that
+        columnar storage can be summarized without building one per day.
+        """
+        key = (d.month, d.day)
+        if key not in self._highs or high_temp > self._highs[key]:
+            self._highs[key] = high_temp
+        self._low_totals[d.month - 1] += low_temp
+        self._low_counts[d.month - 1] += 1
+        month = (d.year, d.month)
+        if month not in self._rollups:
+            self._rollups[month] = Rollup()
+        self._rollups[month].add(low_temp, high_temp, precipitation, snowfall)
+        if self._sketches is not None:
+            self._add_to_sketches(d.month, low_temp, high_temp, precipitation)
+
+    def _ensure_aggregates(self) -> None:
+        """Build _highs, _low_totals, _low_counts and _rollups from the
+        recorded days, if they have not been built yet.
+        """
+        if self._aggregated:
+            return
+        self._aggregated = True
+        # _sketches, if built, already counts these days.
+        sketches, self._sketches = self._sketches, None
+        update = self._update_aggregates
+        columns = self._columns
+        for ordinal, low, high, precipitation, snowfall in zip(
+                columns.ordinals, columns.low_temp, columns.high_temp,
+                columns.precipitation, columns.snowfall):
+            update(date.fromordinal(ordinal), low, high, precipitation,
+                   snowfall)
+        self._sketches = sketches
+
+    def _add_to_sketches(self, month: int, low_temp: float, high_temp: float,
+                         precipitation: float) -> None:
+        """Count a day in month with these values in _sketches.
+
+        Precondition: _sketches is not None.
+        """
+        if month not in self._sketches:
+            self._sketches[month] = _new_sketches()
+        low_sketch, high_sketch, precipitation_sketch = self._sketches[month]
+        low_sketch.add(low_temp)
+        high_sketch.add(high_temp)
+        precipitation_sketch.add(precipitation if precipitation > 0 else 0.0)
+
+    def _month_sketches(self) -> Dict[int, Tuple[Histogram, ...]]:
+        """Return _sketches, building it from the recorded days first if
+        it has not been built yet.
+        """
+        if self._sketches is None:
+            self._sketches = {}
+            for ordinal, low, high, precipitation in zip(
+                    self._ordinals(), self._column('low_temp'),
+                    self._column('high_temp'), self._column('precipitation')):
+                self._add_to_sketches(date.fromordinal(ordinal).month, low,
+                                      high, precipitation)
+        return self._sketches
 
     def retrieve_weather(self, d: date) -> Optional[DailyWeather]:
         """Return the weather on day d if available, otherwise return None.
@@ -210,10 +1207,102 @@ class HistoricalWeather:
         >>> toronto_weather.retrieve_weather(date.today()).avg_temp == 13
         True
         """
-        if d in self._records:
-            return self._records[d]
+        if self._columns is not None:
+            row = self._columns.find(d.toordinal())
+            if row == -1:
+                return None
+            return self._columns.weather_at(row)
         else:
-            return None
+            return self._records.get(d.toordinal())
+
+    def records_between(self, start: date,
+                        end: date) -> List[Tuple[date, DailyWeather]]:
+        """Return (date, weather) pairs for every recorded day from start
+        to end inclusive, ordered from oldest to most recent.
+
+        Return an empty list if start is after end.
+
+        >>> toronto_weather = HistoricalWeather('Toronto', (43.6529, -79.3849))
+        >>> for day in [5, 1, 3]:
+        ...     weather = DailyWeather((day, 0, 30), (0, 0, 0))
+        ...     toronto_weather.add_weather(date(2020, 7, day), weather)
+        >>> [(str(d), w.avg_temp) for d, w in
+        ...  toronto_weather.records_between(date(2020, 7, 2),
+        ...                                  date(2020, 7, 5))]
+        [('2020-07-03', 3), ('2020-07-05', 5)]
+        >>> toronto_weather.records_between(date(2020, 7, 5), date(2020, 7, 1))
+        []
+        """
+        if self._columns is not None:
+            ordinals = self._columns.ordinals
+            lo = bisect_left(ordinals, start.toordinal())
+            hi = bisect_right(ordinals, end.toordinal(), lo)
+            return [(date.fromordinal(ordinals[row]),
+                     self._columns.weather_at(row)) for row in range(lo, hi)]
+        lo = bisect_left(self._days, start.toordinal())
+        hi = bisect_right(self._days, end.toordinal(), lo)
+        return [(date.fromordinal(ordinal), self._records[ordinal])
+                for ordinal in self._days[lo:hi]]
+
+    def _iter_records(self) -> Iterator[Tuple[date, DailyWeather]]:
+        """Yield (date, weather) pairs for every recorded day, ordered from
+        oldest to most recent.
+        """
+        if self._columns is not None:
+            yield from self._columns.items()
+        else:
+            for ordinal in self._days:
+                yield (date.fromordinal(ordinal), self._records[ordinal])
+
+    def _to_columns(self) -> _WeatherColumns:
+        """Return this place's daily weather as columns.
+
+        If this place uses columnar storage, its own columns are returned,
+        so the caller must not change them.
+        """
+        if self._columns is not None:
+            return self._columns
+        columns = _WeatherColumns()
+        for ordinal in self._days:
+            columns.insert(ordinal, self._records[ordinal])
+        return columns
+
+    def _use_columns(self, columns: _WeatherColumns) -> None:
+        """Take columns as the storage for this place's daily weather.
+
+        The aggregates are not built until they are first needed, so this
+        takes no time however many days columns holds, and a memory-mapped
+        column is not read until it is queried.
+
+        Preconditions:
+            - This place uses columnar storage.
+            - No weather has been recorded for this place yet.
+        """
+        self._columns = columns
+        self._aggregated = len(columns) == 0
+        self._changed()
+
+    def _ordinals(self) -> Iterable[int]:
+        """Return the ordinals of every recorded day, in increasing order.
+
+        The caller must not change the result.
+        """
+        if self._columns is not None:
+            return self._columns.ordinals
+        return self._days
+
+    def _column(self, attribute: str) -> Iterable[float]:
+        """Return the value of the DailyWeather attribute with this name for
+        every recorded day, ordered from oldest to most recent.
+
+        Unlike _iter_records, this does not build a DailyWeather per day when
+        the columnar storage is in use.
+        """
+        if self._columns is not None:
+            return getattr(self._columns, attribute)
+        records = self._records
+        return (getattr(records[ordinal], attribute)
+                for ordinal in self._days)
 
     def record_high(self, m: int, d: int) -> float:
         """Return the highest temperature recorded at this location on month m
@@ -237,11 +1326,11 @@ class HistoricalWeather:
         >>> toronto_weather.record_high(6, 8)
         40
         """
-        all_dates = []
-        for date_ in self._records:
-            if date_.month == m and date_.day == d:
-                all_dates.append(self._records[date_].high_temp)
-        return max(all_dates)
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.count('stats_computed')
+        self._ensure_aggregates()
+        return self._highs[(m, d)]
 
     def monthly_average(self) -> Dict[str, float]:
         """For each of the 12 months, return the average of the minimum
@@ -271,17 +1360,146 @@ class HistoricalWeather:
         >>> d['Mar'] is None
         True
         """
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.count('stats_computed')
         month = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
                  'Oct', 'Nov', 'Dec']
         a = {}
-        for m in range(1, 13):
-            total = []
-            for date_ in self._records:
-                if date_.month == m:
-                    total.append(self._records[date_].low_temp)
-            a[month[m - 1]] = helper_get_average(total)
+        self._ensure_aggregates()
+        for m in range(12):
+            if self._low_counts[m] == 0:
+                a[month[m]] = None
+            else:
+                a[month[m]] = self._low_totals[m] / self._low_counts[m]
         return a
 
+    def rollup(self, years: Optional[Iterable[int]] = None,
+               months: Optional[Iterable[int]] = None) -> Rollup:
+        """Return a Rollup of every recorded day that is in one of years and
+        in one of months. If years or months is None, days in any year or any
+        month, respectively, are included.
+
+        The result is merged from the rollup kept for each year and month, so
+        no recorded day is looked at.
+
+        >>> toronto_weather = HistoricalWeather('Toronto', (43.6529, -79.3849))
+        >>> toronto_weather.add_weather(date(2019, 7, 1),
+        ...                             DailyWeather((20, 15, 25), (2, 2, 0)))
+        >>> toronto_weather.add_weather(date(2020, 7, 1),
+        ...                             DailyWeather((22, 18, 31), (-1, 0, 0)))
+        >>> toronto_weather.add_weather(date(2020, 1, 1),
+        ...                             DailyWeather((-5, -9, -1), (4, 0, 4)))
+        >>> summer = toronto_weather.rollup(months=[6, 7, 8])
+        >>> summer.days, summer.highest, summer.mean_low(), summer.precipitation
+        (2, 31, 16.5, 2)
+        >>> toronto_weather.rollup(years=[2020]).snowfall
+        4
+        """
+        if years is not None:
+            years = set(years)
+        if months is not None:
+            months = set(months)
+        result = Rollup()
+        self._ensure_aggregates()
+        for (year, month), partial in self._rollups.items():
+            if ((years is None or year in years)
+                    and (months is None or month in months)):
+                result.merge(partial)
+        return result
+
+    def yearly_rollups(self) -> Dict[int, Rollup]:
+        """Return a Rollup of the recorded days in each year, for every year
+        with at least one day recorded.
+
+        >>> toronto_weather = HistoricalWeather('Toronto', (43.6529, -79.3849))
+        >>> toronto_weather.add_weather(date(2019, 7, 1),
+        ...                             DailyWeather((20, 15, 25), (2, 2, 0)))
+        >>> toronto_weather.add_weather(date(2019, 12, 1),
+        ...                             DailyWeather((-2, -6, 3), (5, 0, 5)))
+        >>> yearly = toronto_weather.yearly_rollups()
+        >>> list(yearly), yearly[2019].mean_high(), yearly[2019].snowfall
+        ([2019], 14.0, 5)
+        """
+        result = {}
+        self._ensure_aggregates()
+        for (year, _), partial in self._rollups.items():
+            if year not in result:
+                result[year] = Rollup()
+            result[year].merge(partial)
+        return result
+
+    def seasonal_rollups(self) -> Dict[Tuple[int, str], Rollup]:
+        """Return a Rollup of the recorded days in each season, keyed by the
+        year and the name of the season (see SEASONS), for every season with
+        at least one day recorded.
+
+        >>> toronto_weather = HistoricalWeather('Toronto', (43.6529, -79.3849))
+        >>> toronto_weather.add_weather(date(2019, 12, 31),
+        ...                             DailyWeather((-2, -6, 3), (5, 0, 5)))
+        >>> toronto_weather.add_weather(date(2020, 1, 1),
+        ...                             DailyWeather((-5, -9, -1), (4, 0, 4)))
+        >>> seasons = toronto_weather.seasonal_rollups()
+        >>> list(seasons), seasons[(2020, 'Winter')].snowfall
+        ([(2020, 'Winter')], 9)
+        """
+        season_of = {}
+        for season, months in SEASONS.items():
+            for month in months:
+                season_of[month] = season
+        result = {}
+        self._ensure_aggregates()
+        for (year, month), partial in self._rollups.items():
+            key = (year + 1 if month == 12 else year, season_of[month])
+            if key not in result:
+                result[key] = Rollup()
+            result[key].merge(partial)
+        return result
+
+    def sketch(self, attribute: str,
+               month: Optional[int] = None) -> Optional[Histogram]:
+        """Return a new Histogram of the values of the DailyWeather attribute
+        with this name on every recorded day in month (1-12), in any year,
+        or on every recorded day if month is None.
+
+        Return None if attribute is not one of those in _SKETCHES.
+
+        >>> toronto_weather = HistoricalWeather('Toronto', (43.6529, -79.3849))
+        >>> for day in range(1, 21):
+        ...     toronto_weather.add_weather(
+        ...         date(2020, 7, day), DailyWeather((20, 15, day), (0, 0, 0)))
+        >>> toronto_weather.sketch('high_temp', 7).count
+        20
+        >>> toronto_weather.percentile('high_temp', 7, 50)
+        10.0
+        >>> toronto_weather.percentile('high_temp', 8, 50) is None
+        True
+        """
+        index = _sketch_index(attribute)
+        if index is None:
+            return None
+        _, low, width, buckets = _SKETCHES[index]
+        result = Histogram(low, width, buckets)
+        for m, sketches in self._month_sketches().items():
+            if month is None or m == month:
+                result.merge(sketches[index])
+        return result
+
+    def percentile(self, attribute: str, month: Optional[int],
+                   q: float) -> Optional[float]:
+        """Return an estimate of the q-th percentile of the values of the
+        DailyWeather attribute with this name on the recorded days in month,
+        or on every recorded day if month is None.
+
+        Return None if no days have been recorded in month. See sketch and
+        Histogram.percentile.
+
+        Preconditions:
+            - attribute is one of those in _SKETCHES
+            - 0 <= q <= 100
+        """
+        return self.sketch(attribute, month).percentile(q)
+
     def contiguous_precipitation(self) -> Tuple[date, int]:
         """Return the start date and length of the longest sequence of
         consecutive days that had precipitation.
@@ -314,20 +1532,155 @@ class HistoricalWeather:
         >>> result[1]
         2
         """
+        if 'contiguous_precipitation' in self._stats:
+            return self._stats['contiguous_precipitation']
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.count('stats_computed')
         cons_days = 0
         date_ = None
-        for d in self._records:
-            count = 0
-            day = timedelta(days=count)
-            while (d + day in self._records
-                   and self._records[d + day].precipitation != 0):
-                count += 1
-                day = timedelta(days=count)
-            if count > cons_days or not date_:
-                cons_days = count
-                date_ = d
+        for start, length in self._precipitation_streaks():
+            if length > cons_days:
+                cons_days = length
+                date_ = start
+        if date_ is None:
+            date_ = date.fromordinal(next(iter(self._ordinals())))
+        self._stats['contiguous_precipitation'] = (date_, cons_days)
         return (date_, cons_days)
 
+    def longest_precipitation_streaks(self, k: int) -> List[Tuple[date, int]]:
+        """Return the start date and length of the k longest sequences of
+        consecutive days that had precipitation, longest first.
+
+        Sequences are defined as in contiguous_precipitation. Ties are
+        ordered from oldest to most recent start date. Fewer than k
+        sequences are returned if there are not that many.
+
+        >>> wet = DailyWeather((0, 0, 0), (1, 0, 0))
+        >>> dry = DailyWeather((0, 0, 0), (0, 0, 0))
+        >>> toronto_weather = HistoricalWeather('Toronto', (43.6529, -79.3849))
+        >>> for day, w in enumerate([wet, dry, wet, wet, wet, dry, wet, wet]):
+        ...     toronto_weather.add_weather(date(2020, 7, day + 1), w)
+        >>> toronto_weather.longest_precipitation_streaks(2)
+        [(datetime.date(2020, 7, 3), 3), (datetime.date(2020, 7, 7), 2)]
+        >>> len(toronto_weather.longest_precipitation_streaks(10))
+        3
+        """
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.count('stats_computed')
+        return heapq.nlargest(k, self._precipitation_streaks(),
+                              key=lambda streak: streak[1])
+
+    def _precipitation_streaks(self) -> Iterator[Tuple[date, int]]:
+        """Yield the start date and length of every maximal sequence of
+        consecutive days that had precipitation, oldest first.
+
+        This makes a single pass over the date index, comparing day ordinals
+        to detect gaps.
+        """
+        start = None
+        length = 0
+        prev = 0
+        for ordinal, precipitation in zip(self._ordinals(),
+                                          self._column('precipitation')):
+            if precipitation == 0:
+                if start is not None:
+                    yield (date.fromordinal(start), length)
+                    start = None
+                continue
+            if start is not None and ordinal == prev + 1:
+                length += 1
+            else:
+                if start is not None:
+                    yield (date.fromordinal(start), length)
+                start = ordinal
+                length = 1
+            prev = ordinal
+        if start is not None:
+            yield (date.fromordinal(start), length)
+
+    def rolling_statistics(self, days: int, attribute: str = 'high_temp'
+                           ) -> Iterator[Tuple[date, float, float, float]]:
+        """Yield (d, mean, maximum, total) for each recorded date d, oldest
+        first, where mean, maximum and total are taken over the given
+        DailyWeather attribute of every recorded day in the window of days
+        calendar days ending on d.
+
+        For precipitation, rainfall and snowfall, trace amounts count as 0.
+
+        The whole history is covered in a single pass, keeping a running
+        total and a deque of candidate maximums for the current window, so
+        results can be consumed as they are produced. The running total is
+        kept with compensated summation, and is exactly 0 whenever every
+        value in the window is 0, so that it does not drift as values enter
+        and leave the window.
+
+        Preconditions:
+            - days >= 1
+            - attribute is one of 'avg_temp', 'low_temp', 'high_temp',
+              'precipitation', 'rainfall' or 'snowfall'
+
+        >>> toronto_weather = HistoricalWeather('Toronto', (43.6529, -79.3849))
+        >>> for day, rain in [(1, 4), (2, -1), (3, 2), (5, 1)]:
+        ...     weather = DailyWeather((0, 0, 0), (rain, rain, 0))
+        ...     toronto_weather.add_weather(date(2020, 7, day), weather)
+        >>> for d, mean, maximum, total in toronto_weather.rolling_statistics(
+        ...         3, 'rainfall'):
+        ...     print(d, mean, maximum, total)
+        2020-07-01 4.0 4 4
+        2020-07-02 2.0 4 4
+        2020-07-03 2.0 4 6
+        2020-07-05 1.5 2 3
+
+        A window of dry days after wet ones has a total of exactly 0:
+
+        >>> for day in range(1, 11):
+        ...     toronto_weather.add_weather(date(2021, 7, day), DailyWeather(
+        ...         (0, 0, 0), (0.1, 0.1, 0)))
+        >>> for day in range(11, 14):
+        ...     toronto_weather.add_weather(date(2021, 7, day), DailyWeather(
+        ...         (0, 0, 0), (0, 0, 0)))
+        >>> last = list(toronto_weather.rolling_statistics(3, 'rainfall'))[-1]
+        >>> last[1], last[3]
+        (0.0, 0)
+        """
+        trace_is_zero = attribute in ('precipitation', 'rainfall', 'snowfall')
+        window = deque()
+        # Indices into window of values that might yet be the maximum, in
+        # decreasing order of value.
+        maximums = deque()
+        # The number of values that have left the front of window.
+        removed = 0
+        total = 0
+        # The rounding error not yet included in total.
+        error = 0
+        # The number of values in window that are not 0.
+        nonzero = 0
+        for ordinal, value in zip(self._ordinals(), self._column(attribute)):
+            if trace_is_zero and value == -1:
+                value = 0
+            while window and window[0][0] <= ordinal - days:
+                old = window.popleft()[1]
+                if old != 0:
+                    nonzero -= 1
+                    total, error = _add_compensated(total, error, -old)
+                if maximums[0] == removed:
+                    maximums.popleft()
+                removed += 1
+            if nonzero == 0:
+                total, error = 0, 0
+            window.append((ordinal, value))
+            if value != 0:
+                nonzero += 1
+                total, error = _add_compensated(total, error, value)
+            index = removed + len(window) - 1
+            while maximums and window[maximums[-1] - removed][1] <= value:
+                maximums.pop()
+            maximums.append(index)
+            yield (date.fromordinal(ordinal), (total + error) / len(window),
+                   window[maximums[0] - removed][1], total + error)
+
     def percentage_snowfall(self) -> float:
         """Return the fraction of the snowfall and rainfall at this location
         that was snowfall, across all dates when weather was recorded there.
@@ -352,14 +1705,16 @@ class HistoricalWeather:
         >>> toronto_weather.percentage_snowfall()
         0.25
         """
-        total_snowfall = []
-        total_rainfall = []
-        for d in self._records:
-            if self._records[d].snowfall != -1:
-                total_snowfall.append(self._records[d].snowfall)
-            if self._records[d].rainfall != -1:
-                total_rainfall.append(self._records[d].rainfall)
-        return sum(total_snowfall) / (sum(total_snowfall) + sum(total_rainfall))
+        if 'percentage_snowfall' in self._stats:
+            return self._stats['percentage_snowfall']
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.count('stats_computed')
+        total_snowfall = sum(s for s in self._column('snowfall') if s != -1)
+        total_rainfall = sum(r for r in self._column('rainfall') if r != -1)
+        result = total_snowfall / (total_snowfall + total_rainfall)
+        self._stats['percentage_snowfall'] = result
+        return result
 
 
 class Country:
@@ -372,6 +1727,16 @@ class Country:
     _histories:
         The weather records for this country. Each key is a locations's name
         and it's value is that locations's weather history
+    _summary_rows:
+        The rows of the summary most recently computed by summary_rows. Each
+        key is a location's name and its value is the _summary_version of
+        that location's weather history when the row was computed, and the
+        row.
+    _grid:
+        A spatial index of the locations in this Country. The Earth is
+        divided into cells _GRID_DEGREES wide and high; each key is the
+        (row, column) of a cell (see _grid_cell), and its value lists the
+        name, latitude and longitude of every location in that cell.
 
     === Sample Usage ===
     >>> weather = DailyWeather((13, 9, 20), (5, 0, 0))
@@ -385,10 +1750,14 @@ class Country:
 
     === Representation Invariants ===
     - For each key, k, of _histories, k == _histories[k].name
+    - Every location in _histories appears in exactly one cell of _grid,
+      and no other location appears in _grid
     """
 
     name: str
     _histories: Dict[str, HistoricalWeather]
+    _summary_rows: Dict[str, Tuple[object, Tuple[float, float, int, float]]]
+    _grid: Dict[Tuple[int, int], List[Tuple[str, float, float]]]
 
     def __init__(self, n: str) -> None:
         """ Initialize this Country with name n and no weather history so far.
@@ -399,6 +1768,8 @@ class Country:
         """
         self.name = n
         self._histories = {}
+        self._summary_rows = {}
+        self._grid = {}
 
     # We will not test this method, but recommend that you write and use it.
     def __str__(self) -> str:
@@ -448,6 +1819,90 @@ Rain: 0
             pass
         else:
             self._histories[hw.name] = hw
+            lat, lon = hw.coordinates
+            self._grid.setdefault(_grid_cell(lat, lon), []).append(
+                (hw.name, lat, lon))
+
+    def nearest_stations(self, lat: float, lon: float,
+                         k: int) -> List[Tuple[str, float]]:
+        """Return the names of the k locations in this Country closest to
+        latitude lat and longitude lon, with their great-circle distance from
+        there in km, closest first.
+
+        Return every location if there are fewer than k.
+
+        Only grid cells near (lat, lon) are examined: the search widens one
+        ring of cells at a time, and stops as soon as no location outside the
+        cells examined could be closer than the k closest found so far.
+
+        >>> canada = Country('Canada')
+        >>> for name, coordinates in [('YYZ', (43.68, -79.63)),
+        ...                           ('Montreal', (45.47, -73.74)),
+        ...                           ('Toronto', (43.65, -79.38))]:
+        ...     canada.add_history(HistoricalWeather(name, coordinates))
+        >>> [(name, round(km)) for name, km in
+        ...  canada.nearest_stations(43.7, -79.4, 2)]
+        [('Toronto', 6), ('YYZ', 19)]
+        """
+        if k <= 0:
+            return []
+        row, col = _grid_cell(lat, lon)
+        # A max-heap, by distance, of the k closest locations found so far.
+        closest = []
+        found = 0
+        total = len(self._location_names())
+        ring = 0
+        while found < total:
+            for cell in _grid_ring(row, col, ring):
+                for name, other_lat, other_lon in self._grid.get(cell, []):
+                    found += 1
+                    distance = _distance_km(lat, lon, other_lat, other_lon)
+                    if len(closest) < k:
+                        heapq.heappush(closest, (-distance, name))
+                    elif distance < -closest[0][0]:
+                        heapq.heapreplace(closest, (-distance, name))
+            if (len(closest) == k and -closest[0][0]
+                    <= _distance_outside_ring(lat, lon, row, col, ring)):
+                break
+            ring += 1
+        return [(name, -distance) for distance, name in
+                sorted(closest, reverse=True)]
+
+    def stations_within(self, bbox: Tuple[float, float, float, float]
+                        ) -> List[str]:
+        """Return the names of the locations in this Country inside bbox,
+        in no particular order.
+
+        bbox is (south, west, north, east): the lowest and highest latitude
+        and the westmost and eastmost longitude of the box, all inclusive.
+        If west > east, the box crosses longitude 180.
+
+        Only grid cells overlapping the box are examined.
+
+        >>> canada = Country('Canada')
+        >>> for name, coordinates in [('YYZ', (43.68, -79.63)),
+        ...                           ('Montreal', (45.47, -73.74)),
+        ...                           ('Toronto', (43.65, -79.38))]:
+        ...     canada.add_history(HistoricalWeather(name, coordinates))
+        >>> sorted(canada.stations_within((43, -80, 44, -79)))
+        ['Toronto', 'YYZ']
+        """
+        south, west, north, east = bbox
+        first_row, last_row = _grid_cell(south, 0)[0], _grid_cell(north, 0)[0]
+        west_col = math.floor(west / _GRID_DEGREES)
+        east_col = math.floor(east / _GRID_DEGREES)
+        if west > east:
+            east_col += _GRID_COLUMNS
+        columns = {col % _GRID_COLUMNS for col in range(west_col, east_col + 1)}
+        result = []
+        for row in range(first_row, last_row + 1):
+            for col in columns:
+                for name, lat, lon in self._grid.get((row, col), []):
+                    if south <= lat <= north and (
+                            west <= lon <= east if west <= east
+                            else lon >= west or lon <= east):
+                        result.append(name)
+        return result
 
     def retrieve_history(self, name: str) -> Optional[HistoricalWeather]:
         """Return the weather history for the location called name, or
@@ -467,6 +1922,30 @@ Rain: 0
         else:
             return None
 
+    def save_packed(self, filename: str) -> None:
+        """Write every location in this Country, with all of its daily
+        weather, to a single binary file called filename.
+
+        The file can be reopened with open_packed. Numbers are written in
+        this machine's native byte order.
+        """
+        encoded = self.name.encode('utf-8')
+        stations = 0
+        with open(filename, 'wb') as f:
+            # The number of stations is filled in once they are written.
+            f.write(_COUNTRY_HEADER.pack(_COUNTRY_MAGIC, 0, len(encoded)))
+            f.write(encoded + bytes(_padding(_COUNTRY_HEADER.size
+                                             + len(encoded))))
+            for name in list(self._location_names()):
+                history = self.retrieve_history(name)
+                if history is not None:
+                    _write_station(f, history.name, history.coordinates,
+                                   history._to_columns(), (0, 0))
+                    stations += 1
+            f.seek(0)
+            f.write(_COUNTRY_HEADER.pack(_COUNTRY_MAGIC, stations,
+                                         len(encoded)))
+
     def snowiest_location(self) -> Union[Tuple[str, float], Tuple[None, None]]:
         """Return the name of location with the highest percentage snowfall in
         this Country, and its percentage snowfall.
@@ -494,15 +1973,49 @@ Rain: 0
         >>> result[1]
         0.6
         """
-        result = ['', 0]
-        if len(self._histories) == 0:
-            return (None, None)
-        else:
-            for loc in self._histories:
-                if self._histories[loc].percentage_snowfall() >= result[1]:
+        result = [None, None]
+        for loc in list(self._location_names()):
+            history = self.retrieve_history(loc)
+            if history is not None:
+                percentage = history.percentage_snowfall()
+                if result[1] is None or percentage >= result[1]:
                     result[0] = loc
-                    result[1] = self._histories[loc].percentage_snowfall()
-            return (result[0], result[1])
+                    result[1] = percentage
+        return (result[0], result[1])
+
+    def sketch(self, attribute: str,
+               month: Optional[int] = None) -> Optional[Histogram]:
+        """Return a new Histogram of the values of the DailyWeather attribute
+        with this name on the recorded days in month, in any year, at every
+        location in this Country, or on every recorded day if month is None.
+
+        Return None if attribute is not one of those in _SKETCHES.
+
+        >>> canada = Country('Canada')
+        >>> for name, high in [('Toronto', 30), ('Iqaluit', 10)]:
+        ...     history = HistoricalWeather(name, (0, 0))
+        ...     history.add_weather(date(2020, 7, 1),
+        ...                         DailyWeather((0, 0, high), (0, 0, 0)))
+        ...     canada.add_history(history)
+        >>> canada.sketch('high_temp', 7).count
+        2
+        >>> canada.sketch('high_temp', 7).percentile(100)
+        30.0
+        """
+        index = _sketch_index(attribute)
+        if index is None:
+            return None
+        _, low, width, buckets = _SKETCHES[index]
+        result = Histogram(low, width, buckets)
+        for name in list(self._location_names()):
+            history = self.retrieve_history(name)
+            if history is None:
+                continue
+            sketches = history._month_sketches()
+            for m in sketches:
+                if month is None or m == month:
+                    result.merge(sketches[m][index])
+        return result
 
     def generate_summary(self) -> None:
         """
@@ -514,28 +2027,917 @@ Rain: 0
           recorded in December of any year
         - Data has been recorded for Dec 25 in at least one year
         """
+        self.write_summary("report.md")
+
+    def write_summary(self, filename: str, report_format: str = 'markdown',
+                      chunk_size: int = 1024) -> int:
+        """Write the summary of interesting statistics for the locations in
+        this Country to the file called filename, and return the number of
+        locations written.
+
+        report_format is 'markdown' for the table written by generate_summary,
+        'csv' for a csv file with a header line, or 'jsonl' for one JSON
+        object per line. Rows are computed as they are needed (see
+        summary_rows) and written chunk_size at a time, so the whole report is
+        never held in memory.
+
+        Precondition:
+        - report_format in REPORT_FORMATS
+        - chunk_size >= 1
+        - The preconditions of generate_summary hold
+
+        >>> import tempfile
+        >>> folder = tempfile.mkdtemp()
+        >>> canada = Country('Canada')
+        >>> for name, high in [('Ottawa', -2), ('Iqaluit', -20)]:
+        ...     history = HistoricalWeather(name, (0, 0))
+        ...     history.add_weather(date(2020, 12, 25), DailyWeather(
+        ...         (high - 3, high - 7, high), (4, 0, 4)))
+        ...     canada.add_history(history)
+        >>> path = os.path.join(folder, 'report.csv')
+        >>> canada.write_summary(path, 'csv')
+        2
+        >>> with open(path) as f:
+        ...     print(f.read(), end='')
+        location,record_high_dec_25,december_average,\
+contiguous_precipitation,percentage_snowfall
+        Ottawa,-2,-9.0,1,1.0
+        Iqaluit,-20,-27.0,1,1.0
+
+        Writing one row at a time gives the same file:
+
+        >>> with open(path) as f:
+        ...     whole = f.read()
+        >>> canada.write_summary(path, 'csv', chunk_size=1)
+        2
+        >>> with open(path) as f:
+        ...     f.read() == whole
+        True
+        >>> path = os.path.join(folder, 'report.jsonl')
+        >>> canada.write_summary(path, 'jsonl', chunk_size=1)
+        2
+        >>> with open(path) as f:
+        ...     [json.loads(line)['location'] for line in f]
+        ['Ottawa', 'Iqaluit']
+        """
+        start = time.perf_counter()
+        header, write_rows = REPORT_FORMATS[report_format]
+        rows = self.summary_rows()
+        written = 0
+        with open(filename, 'w', newline='') as f:
+            f.write(header)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                write_rows(f, chunk)
+                written += len(chunk)
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.add_time('write_summary', time.perf_counter() - start)
+        return written
+
+    def summary_rows(self) -> Iterator[Tuple[str, float, float, int, float]]:
+        """Yield, for each location in this Country in the order it was added,
+        its name, its record high for Dec 25, its December average, its
+        longest run of contiguous precipitation and its percentage snowfall.
+
+        A row is only computed again if weather has been added to that
+        location since it was last computed.
+
+        Precondition: The preconditions of generate_summary hold
+
+        >>> canada = Country('Canada')
+        >>> ottawa = HistoricalWeather('Ottawa', (45.4, -75.7))
+        >>> ottawa.add_weather(date(2020, 12, 25),
+        ...                    DailyWeather((-5, -9, -2), (4, 0, 4)))
+        >>> canada.add_history(ottawa)
+        >>> list(canada.summary_rows())
+        [('Ottawa', -2, -9.0, 1, 1.0)]
+        """
+        names = list(self._location_names())
+        stale = [key for key in names if not self._summary_current(key)]
+        computed = map(self._compute_summary_row, stale)
+        yield from self._merge_summary_rows(names, stale, computed)
+
+    def _compute_summary_row(self, key: str) -> Optional[
+            Tuple[object, Tuple[float, float, int, float]]]:
+        """Return the _summary_version of the history of the location called
+        key and its row of the summary, without the name, or None if it is no
+        longer in this Country.
+        """
+        history = self.retrieve_history(key)
+        if history is None:
+            return None
+        # Take the version first, so that weather added while the row is
+        # computed makes it out of date.
+        version = self._summary_version(key, history)
+        return (version, _summary_values(history))
+
+    def _summary_version(self, key: str, history: HistoricalWeather) -> object:
+        """Return a value that changes whenever the weather that a summary
+        row of history, the history of the location called key, would be
+        computed from changes.
+        """
+        return history._version
+
+    def _summary_current(self, key: str) -> bool:
+        """Return whether the row of _summary_rows for the location called
+        key is still up to date.
+        """
+        return (key in self._summary_rows
+                and self._summary_rows[key][0]
+                == self._summary_version(key, self._histories[key]))
+
+    def _cache_summary_row(self, key: str, version: object,
+                           values: Tuple[float, float, int, float]) -> None:
+        """Keep values as the row of the location called key in
+        _summary_rows, computed when its history had this _summary_version.
+        """
+        self._summary_rows[key] = (version, values)
+
+    def _cached_summary_row(self, key: str) -> Optional[
+            Tuple[float, float, int, float]]:
+        """Return the row of the location called key in _summary_rows, or
+        None if it has none.
+        """
+        row = self._summary_rows.get(key)
+        return None if row is None else row[1]
+
+    def _merge_summary_rows(self, names: List[str], stale: List[str],
+                            computed: Iterable[Optional[Tuple[
+                                object, Tuple[float, float, int, float]]]]
+                            ) -> Iterator[Tuple[str, float, float, int, float]]:
+        """Yield the row of every location in names, in order, taking the
+        rows of the locations in stale from computed and the rest from
+        _summary_rows.
+
+        Precondition:
+        - stale lists, in order, exactly the locations in names whose rows in
+          _summary_rows are missing or out of date, and computed yields the
+          _summary_version of each one's history with its new row, in the
+          same order, or None for a location removed from this Country, which
+          is skipped
+        """
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.count('summary_rows_computed', len(stale))
+            profile.count('summary_rows_cached', len(names) - len(stale))
+        computed = iter(computed)
+        stale = set(stale)
+        for key in names:
+            if key in stale:
+                entry = next(computed)
+                if entry is None:
+                    continue
+                version, values = entry
+                self._cache_summary_row(key, version, values)
+            else:
+                values = self._cached_summary_row(key)
+                if values is None:
+                    # The location has been removed since names was listed.
+                    continue
+            yield (key,) + values
+
+    def _location_names(self) -> Collection[str]:
+        """Return the name of every location in this Country, in the order
+        they were added.
+        """
+        return self._histories.keys()
+
+
+def _add_compensated(total: float, error: float,
+                     value: float) -> Tuple[float, float]:
+    """Return the new total and rounding error after adding value to a sum
+    kept as total plus error, by Neumaier's compensated summation.
+
+    >>> total, error = 0.0, 0.0
+    >>> for value in [0.1] * 10 + [-0.1] * 10:
+    ...     total, error = _add_compensated(total, error, value)
+    >>> total + error
+    0.0
+    """
+    new_total = total + value
+    if abs(total) >= abs(value):
+        error += (total - new_total) + value
+    else:
+        error += (value - new_total) + total
+    return (new_total, error)
+
+
+def _summary_values(loc: HistoricalWeather) -> Tuple[float, float, int, float]:
+    """Return the statistics reported for loc by Country.summary_rows.
+    """
+    start = time.perf_counter()
+    values = (loc.record_high(12, 25), loc.monthly_average()['Dec'],
+              loc.contiguous_precipitation()[1], loc.percentage_snowfall())
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.add_time('statistics', time.perf_counter() - start)
+    return values
+
+
+# The names of the columns of a summary, in the order of summary_rows.
+_SUMMARY_FIELDS = ('location', 'record_high_dec_25', 'december_average',
+                   'contiguous_precipitation', 'percentage_snowfall')
+
+
+def _markdown_header() -> str:
+    """Return the header of the markdown table written by generate_summary.
+    """
+    headers = ["Location", "record high <br/> for Dec 25",
+               "december <br/> average",
+               "contiguous <br/> precipitation",
+               "percentage <br/> snowfall"]
+    return (" | ".join(headers) + "\n"
+            + ":|-".join(["-" * len(col) for col in headers]) + ":\n")
+
+
+def _write_markdown_rows(f: TextIO,
+                         rows: List[Tuple[str, float, float, int, float]]
+                         ) -> None:
+    """Write rows to f as rows of the markdown table of generate_summary.
+    """
+    f.write("".join(f"{key : <20} | {rec_high : <10.4} | "
+                    f"{dec_avg} | "
+                    f"{ctgs_prec : <24} | {perc_snow : <18.2}\n"
+                    for key, rec_high, dec_avg, ctgs_prec, perc_snow in rows))
+
+
+def _write_csv_rows(f: TextIO,
+                    rows: List[Tuple[str, float, float, int, float]]) -> None:
+    """Write rows to f as lines of a csv file.
+    """
+    csv.writer(f).writerows(rows)
+
+
+def _write_jsonl_rows(f: TextIO,
+                      rows: List[Tuple[str, float, float, int, float]]
+                      ) -> None:
+    """Write rows to f as JSON objects, one per line.
+    """
+    f.write("".join(json.dumps(dict(zip(_SUMMARY_FIELDS, row))) + "\n"
+                    for row in rows))
+
+
+# For each format accepted by Country.write_summary, the text at the start of
+# the file and the function that writes a chunk of rows.
+REPORT_FORMATS = {
+    'markdown': (_markdown_header(), _write_markdown_rows),
+    'csv': (",".join(_SUMMARY_FIELDS) + "\r\n", _write_csv_rows),
+    'jsonl': ("", _write_jsonl_rows),
+}
+
+
+def _sketch_index(attribute: str) -> Optional[int]:
+    """Return the position of the attribute with this name in _SKETCHES,
+    or None if it is not there.
+    """
+    for index, sketched in enumerate(_SKETCHES):
+        if sketched[0] == attribute:
+            return index
+    return None
+
+
+class LazyCountry(Country):
+    """The weather records for the locations in a folder of data files,
+    parsed only when they are needed.
+
+    Creating a LazyCountry reads just the first row of data of each file, to
+    learn its location's name and coordinates, so it takes almost no time.
+    A location's file is parsed the first time its history is retrieved,
+    and at most max_resident parsed histories are kept: when another one is
+    needed, the one used least recently is dropped, to be parsed again if it
+    is needed later. Any weather added to a dropped history is lost.
+    Histories added with add_history, which have no file, are never dropped.
+
+    Every Country method works on a LazyCountry, parsing files as needed.
+
+    === Instance Attributes ===
+    folder_name: The folder holding the data files of this Country.
+    max_resident: The most parsed histories of data files kept at once.
+
+    === Private Attributes ===
+    _paths:
+        For each location in this Country, in the order they were added, the
+        path of its data file, or None if it was added with add_history.
+    _coordinates:
+        The coordinates of each location in _paths with a data file.
+    _columnar: Whether parsed histories use columnar storage.
+    _cache_dir: The folder of cached copies of the data files, as described
+        in load_country, or None to parse them without a cache.
+    _parsed: For each location in _histories with a data file, the size and
+        modification time (in ns) of the file just before it was parsed,
+        and the _version of its history just after.
+    _lock: Held while _histories, _paths, _coordinates, _parsed,
+        _summary_rows or _grid is read or changed, so that several threads
+        can retrieve histories at once. It is not held while a file is
+        parsed.
+
+    In this class, _histories holds only the histories that are parsed or
+    that have no data file, from least to most recently used. The rows of
+    _summary_rows of locations with a data file are kept with the size and
+    modification time of the file and the number of times weather has been
+    added since it was parsed, so a row is computed again once the file
+    changes, or once weather added to a dropped history is lost.
+
+    === Representation Invariants ===
+    - Every key of _histories is a key of _paths
+    - The keys of _parsed are exactly the keys of _histories with a path
+    - At most max_resident keys of _histories have a path in _paths
+    - Every location in _paths appears in exactly one cell of _grid, and no
+      other location appears in _grid
+
+    === Sample Usage ===
+    >>> folder = os.path.join(os.path.dirname(__file__), 'student_data')
+    >>> canada = LazyCountry('Canada', folder, max_resident=1)
+    >>> sorted(canada._paths), canada._histories
+    (['THUNDER BAY', 'YORK'], {})
+    >>> canada.retrieve_history('YORK').record_high(12, 25)
+    13.6
+    >>> list(canada._histories)
+    ['YORK']
+    >>> canada.snowiest_location()
+    ('YORK', 1.0)
+    >>> len(canada._histories)
+    1
+    >>> [row[0] for row in canada.summary_rows()]
+    ['THUNDER BAY', 'YORK']
+    >>> len(canada._histories)
+    1
+
+    A file whose rows all have missing data holds no location:
+
+    >>> import shutil
+    >>> import tempfile
+    >>> folder_copy = tempfile.mkdtemp()
+    >>> _ = shutil.copy(os.path.join(folder, 'single_sample_data.csv'),
+    ...                 folder_copy)
+    >>> with open(os.path.join(folder_copy, 'missing.csv'), 'w') as f:
+    ...     _ = f.write('header\\n'
+    ...                 '79.5,43.7,EMPTY,1,,2019,12,24,,3,,-2,,0.5,,,,,,'
+    ...                 '0,M,1,,1,,,,,,,\\n')
+    >>> sparse = LazyCountry('Canada', folder_copy)
+    >>> sorted(sparse._paths)
+    ['YORK']
+    >>> [name for name, _ in sparse.nearest_stations(43.7, 79.5, 2)]
+    ['YORK']
+    >>> sparse.snowiest_location()
+    ('YORK', 1.0)
+    >>> [row[0] for row in sparse.summary_rows()]
+    ['YORK']
+
+    A summary row is computed again once its location's file has changed:
+
+    >>> changing = tempfile.mkdtemp()
+    >>> row = '0,0,{},1,,{},12,25,,{},,-2,,0.5,,,,,,0,,1,,1,,,,,,,\\n'
+    >>> for name in ['A', 'B']:
+    ...     with open(os.path.join(changing, name + '.csv'), 'w') as f:
+    ...         _ = f.write('header\\n' + row.format(name, 2019, 3))
+    >>> lazy = LazyCountry('Canada', changing, max_resident=1)
+    >>> sorted(lazy.summary_rows())
+    [('A', 3.0, -2.0, 1, 1.0), ('B', 3.0, -2.0, 1, 1.0)]
+    >>> with open(os.path.join(changing, 'A.csv'), 'a') as f:
+    ...     _ = f.write(row.format('A', 2020, 30))
+    >>> _ = lazy.retrieve_history('B')
+    >>> sorted(lazy.summary_rows())
+    [('A', 30.0, -2.0, 1, 1.0), ('B', 3.0, -2.0, 1, 1.0)]
+    """
+    folder_name: str
+    max_resident: int
+    _paths: Dict[str, Optional[str]]
+    _coordinates: Dict[str, Tuple[float, float]]
+    _columnar: bool
+    _cache_dir: Optional[str]
+    _parsed: Dict[str, Tuple[Tuple[int, int], int]]
+    _lock: threading.Lock
+
+    def __init__(self, n: str, folder_name: str, max_resident: int = 64,
+                 columnar: bool = False,
+                 cache_dir: Optional[str] = None) -> None:
+        """Initialize this Country with name n and the locations of the data
+        files in the folder called folder_name, none of them parsed yet.
+
+        Files are read as described in load_country. As there, if two files
+        hold the same location, only the first is used, and a file with no
+        rows of data is ignored.
+
+        Preconditions:
+        - max_resident >= 1
+        - the preconditions of load_country hold
+        """
+        Country.__init__(self, n)
+        self.folder_name = folder_name
+        self.max_resident = max_resident
+        self._paths = {}
+        self._coordinates = {}
+        self._columnar = columnar
+        self._cache_dir = cache_dir
+        self._parsed = {}
+        self._lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        for path in _station_files(folder_name):
+            with open(path, 'r') as location_file:
+                reader = csv.reader(location_file)
+                next(reader, None)
+                first = next(reader, None)
+                # Read on only as far as the first row without missing data.
+                if (first is None or next(_read_days(chain([first], reader)),
+                                          None) is None):
+                    continue
+            if first[STN_NAME] in self._paths:
+                continue
+            name = first[STN_NAME]
+            lat, lon = float(first[LAT]), float(first[LONG])
+            self._paths[name] = path
+            self._coordinates[name] = (lat, lon)
+            self._grid.setdefault(_grid_cell(lat, lon), []).append(
+                (name, lat, lon))
+
+    def add_history(self, hw: HistoricalWeather) -> None:
+        """Add a location to this Country, as Country.add_history does.
+
+        The history is kept in memory for as long as this Country exists.
+        """
+        with self._lock:
+            if hw.name not in self._paths:
+                self._paths[hw.name] = None
+                Country.add_history(self, hw)
+
+    def retrieve_history(self, name: str) -> Optional[HistoricalWeather]:
+        """Return the weather history for the location called name, or
+        None if no such location has been recorded in this Country.
+
+        The location's data file is parsed if its history is not already
+        kept, which may drop the least recently used history.
+
+        If the file has changed so that it has no rows of data without
+        missing data, the location is removed from this Country and None is
+        returned.
+
+        Files are parsed without holding _lock, so several threads can parse
+        different files at once. If two threads parse the same file at once,
+        both get the history kept by the first to finish.
+        """
+        with self._lock:
+            if name in self._histories:
+                # Move it to the most recently used end.
+                history = self._histories.pop(name)
+                self._histories[name] = history
+                return history
+            path = self._paths.get(name)
+        if path is None:
+            return None
+        source = _file_source(path)
+        history = _load_station(path, self._columnar, self._cache_dir)
+        with self._lock:
+            return self._keep(name, path, source, history)
+
+    def _keep(self, name: str, path: str, source: Tuple[int, int],
+              history: Optional[HistoricalWeather]
+              ) -> Optional[HistoricalWeather]:
+        """Keep history, parsed from the file at path when its size and
+        modification time were source, as the history of the location called
+        name, and return the history now kept for it.
+
+        If the location has been removed while the file was parsed, or
+        history is None, return None, removing the location if it is still
+        in this Country. If another history has been kept for the location
+        while the file was parsed, keep and return that one instead.
+
+        Precondition: _lock is held.
+        """
+        if self._paths.get(name) != path:
+            return None
+        if name in self._histories:
+            return self._histories[name]
+        if history is None:
+            self._remove(name)
+            return None
+        resident = [key for key in self._histories
+                    if self._paths[key] is not None]
+        for key in resident[:len(resident) - self.max_resident + 1]:
+            del self._histories[key]
+            del self._parsed[key]
+        self._histories[name] = history
+        self._parsed[name] = (source, history._version)
+        return history
+
+    def _remove(self, name: str) -> None:
+        """Remove the location called name, which has a data file and is not
+        kept in _histories, from this Country.
+        """
+        lat, lon = self._coordinates.pop(name)
+        del self._paths[name]
+        self._summary_rows.pop(name, None)
+        cell = self._grid[_grid_cell(lat, lon)]
+        cell.remove((name, lat, lon))
+
+    def _summary_version(self, key: str, history: HistoricalWeather) -> object:
+        """Return a value that changes whenever the weather that a summary
+        row of history, the history of the location called key, would be
+        computed from changes.
+
+        For a location with a data file, this is the size and modification
+        time of the file when history was parsed, and the number of times
+        weather has been added to history since. It is None if history is no
+        longer kept, so that a row computed from it is never up to date.
+        """
+        with self._lock:
+            if self._paths.get(key) is None:
+                return history._version
+            if self._histories.get(key) is not history:
+                return None
+            source, version = self._parsed[key]
+            return (source, history._version - version)
+
+    def _summary_current(self, key: str) -> bool:
+        """Return whether the row of _summary_rows for the location called
+        key is still up to date.
+
+        The row of a location with a data file whose history is not kept is
+        up to date if the file has not changed since the row was computed
+        and no weather had been added to the history it was computed from.
+        """
+        with self._lock:
+            if key not in self._summary_rows:
+                return False
+            version = self._summary_rows[key][0]
+            path = self._paths.get(key)
+            history = self._histories.get(key)
+        if history is not None:
+            return version == self._summary_version(key, history)
+        if path is None:
+            return False
+        try:
+            return version == (_file_source(path), 0)
+        except OSError:
+            return False
+
+    def _cache_summary_row(self, key: str, version: object,
+                           values: Tuple[float, float, int, float]) -> None:
+        """Keep values as the row of the location called key in
+        _summary_rows, computed when its history had this _summary_version,
+        unless the location has been removed.
+        """
+        with self._lock:
+            if key in self._paths:
+                self._summary_rows[key] = (version, values)
+
+    def _cached_summary_row(self, key: str) -> Optional[
+            Tuple[float, float, int, float]]:
+        """Return the row of the location called key in _summary_rows, or
+        None if it has none.
+        """
+        with self._lock:
+            return Country._cached_summary_row(self, key)
+
+    def _location_names(self) -> Collection[str]:
+        """Return the name of every location in this Country, in the order
+        they were added.
+        """
+        with self._lock:
+            return list(self._paths)
+
+
+class WeatherRegistry:
+    """The weather records of several countries, served together.
+
+    Queries about every location in the registry are split into shards of
+    at most shard_size locations from one country each, so a large country
+    is spread over several shards. The shards are answered at once by a pool
+    of threads, and their partial results are merged into the answer.
+
+    === Instance Attributes ===
+    shard_size: The most locations in one shard.
+    workers: The number of threads that answer shards at once.
+
+    === Private Attributes ===
+    _countries: The countries in this registry. Each key is a country's name
+        and its value is that Country.
+
+    === Representation Invariants ===
+    - shard_size >= 1 and workers >= 1
+    - For each key, k, of _countries, k == _countries[k].name
+
+    === Sample Usage ===
+    >>> canada = Country('Canada')
+    >>> yyz = HistoricalWeather('YYZ', (43.68, -79.63))
+    >>> yyz.add_weather(date(2020, 1, 1), DailyWeather((0, -5, 2), (5, 1, 4)))
+    >>> canada.add_history(yyz)
+    >>> norway = Country('Norway')
+    >>> oslo = HistoricalWeather('Oslo', (59.91, 10.75))
+    >>> oslo.add_weather(date(2020, 1, 1), DailyWeather((0, -5, 2), (5, 0, 5)))
+    >>> norway.add_history(oslo)
+    >>> registry = WeatherRegistry()
+    >>> registry.add_country(canada)
+    >>> registry.add_country(norway)
+    >>> registry.snowiest_location()
+    ('Norway', 'Oslo', 1.0)
+    >>> [(country, name, round(km)) for country, name, km in
+    ...  registry.nearest_stations(45.5, -73.6, 1)]
+    [('Canada', 'YYZ', 518)]
+    """
+    shard_size: int
+    workers: int
+    _countries: Dict[str, Country]
+
+    def __init__(self, shard_size: int = 256, workers: int = 4) -> None:
+        """Initialize this registry with no countries, splitting queries into
+        shards of at most shard_size locations answered by workers threads.
+
+        Preconditions:
+        - shard_size >= 1
+        - workers >= 1
+        """
+        self.shard_size = shard_size
+        self.workers = workers
+        self._countries = {}
+
+    def add_country(self, country: Country) -> None:
+        """Add country to this registry.
+
+        If a country with the name country.name is already in this registry,
+        then do nothing.
+        """
+        if country.name not in self._countries:
+            self._countries[country.name] = country
+
+    def retrieve_country(self, name: str) -> Optional[Country]:
+        """Return the country called name, or None if it is not in this
+        registry.
+        """
+        return self._countries.get(name)
 
-        headers = ["Location", "record high <br/> for Dec 25",
-                   "december <br/> average",
-                   "contiguous <br/> precipitation",
-                   "percentage <br/> snowfall"]
+    def map_locations(self, function: Callable[[HistoricalWeather], object]
+                      ) -> List[Tuple[str, str, object]]:
+        """Return the name of each country, the name of each of its locations
+        and the result of calling function on that location's history, for
+        every location in this registry, in the order they were added.
 
-        with open("report.md", 'w') as f:
-            f.write(" | ".join(headers) + "\n")
-            f.write(":|-".join(["-" * len(col) for col in headers]) + ":\n")
-            for key in self._histories:
-                loc = self._histories[key]
-                (rec_high, mon_avg,
-                 ctgs_prec, perc_snow) = (loc.record_high(12, 25),
-                                          loc.monthly_average(),
-                                          loc.contiguous_precipitation(),
-                                          loc.percentage_snowfall())
-                f.write(f"{key : <20} | {rec_high : <10.4} | "
-                        f"{mon_avg['Dec']} | "
-                        f"{ctgs_prec[1] : <24} | {perc_snow : <18.2}\n")
+        function is called from several threads at once.
+        """
+        return [result for part in self._fan_out(_map_shard, function)
+                for result in part]
+
+    def snowiest_location(self) -> Union[Tuple[str, str, float],
+                                         Tuple[None, None, None]]:
+        """Return the name of the country and location with the highest
+        percentage snowfall in this registry, and its percentage snowfall.
+
+        In the case of a tie, the location added last is returned, as in
+        Country.snowiest_location. If there are no locations, return
+        (None, None, None).
+
+        Precondition: The precondition of Country.snowiest_location holds
+            for every country in this registry.
+        """
+        result = (None, None, None)
+        for part in self._fan_out(_snowiest_in_shard):
+            if part is not None and (result[2] is None
+                                     or part[2] >= result[2]):
+                result = part
+        return result
+
+    def nearest_stations(self, lat: float, lon: float,
+                         k: int) -> List[Tuple[str, str, float]]:
+        """Return the name of the country and location of the k locations in
+        this registry closest to latitude lat and longitude lon, with their
+        great-circle distance from there in km, closest first.
+
+        Each country is searched by its own Country.nearest_stations, in
+        parallel, and the results merged.
+        """
+        countries = list(self._countries.values())
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            parts = pool.map(lambda country: [
+                (country.name, name, distance) for name, distance
+                in country.nearest_stations(lat, lon, k)], countries)
+            return heapq.nsmallest(k, chain.from_iterable(parts),
+                                   key=itemgetter(2))
+
+    def _shards(self) -> List[Tuple[Country, List[str]]]:
+        """Return each shard of this registry: a country and the names of at
+        most shard_size of its locations, in order.
+        """
+        shards = []
+        for country in self._countries.values():
+            names = list(country._location_names())
+            for start in range(0, len(names), self.shard_size):
+                shards.append((country, names[start:start + self.shard_size]))
+        return shards
+
+    def _fan_out(self, function: Callable, *args: object) -> Iterator:
+        """Yield the result of calling function with each shard's country,
+        its list of names and args, in the order of the shards, computing
+        them in a pool of threads.
+
+        Each shard runs in a copy of the caller's context, so that an active
+        Profile records the work done in the pool.
+        """
+        shards = self._shards()
+        contexts = [contextvars.copy_context() for _ in shards]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            yield from pool.map(
+                lambda shard, context: context.run(function, *shard, *args),
+                shards, contexts)
+
+
+def _map_shard(country: Country, names: List[str],
+               function: Callable[[HistoricalWeather], object]
+               ) -> List[Tuple[str, str, object]]:
+    """Return the name of country, the name and the result of calling
+    function on the history of each location in names, in order, skipping
+    any location no longer in country.
+    """
+    result = []
+    for name in names:
+        history = country.retrieve_history(name)
+        if history is not None:
+            result.append((country.name, name, function(history)))
+    return result
+
+
+def _snowiest_in_shard(country: Country, names: List[str]
+                       ) -> Optional[Tuple[str, str, float]]:
+    """Return the name of country, and the name and percentage snowfall of
+    the location in names with the highest percentage snowfall, preferring
+    the last in case of a tie, or None if names is empty.
+    """
+    result = None
+    for name in names:
+        history = country.retrieve_history(name)
+        if history is None:
+            continue
+        percentage = history.percentage_snowfall()
+        if result is None or percentage >= result[2]:
+            result = (country.name, name, percentage)
+    return result
 
 
-def load_data(f: TextIO) -> Optional[HistoricalWeather]:
+class WeatherFeed:
+    """A reader that follows the data files in a folder as rows are appended
+    to them, adding the new days to a Country.
+
+    Each call to poll reads only the bytes appended to each file since the
+    previous call, so keeping a Country up to date costs time proportional
+    to the new data rather than to the whole history. Adding the days
+    through HistoricalWeather also keeps its aggregates up to date and marks
+    its cached statistics, and its row of report.md, as out of date.
+
+    === Instance Attributes ===
+    country: The Country that new weather is added to.
+    folder_name: The folder holding the data files being followed.
+
+    === Private Attributes ===
+    _columnar: Whether locations first seen by this feed use columnar
+        storage.
+    _offsets: For each data file read so far, the number of bytes of it that
+        have been read. Only whole lines are ever read.
+    _histories: For each data file that has had at least one row of data,
+        the weather history that its rows are added to.
+
+    === Sample Usage ===
+    >>> import tempfile
+    >>> folder = tempfile.mkdtemp()
+    >>> path = os.path.join(folder, 'york.csv')
+    >>> row = '79.5,43.7,YORK,1,,2019,12,{},,3,,-2,,0.5,,,,,,0,,1,,1,,,,,,,\\n'
+    >>> with open(path, 'w') as f:
+    ...     _ = f.write('header\\n' + row.format(24))
+    >>> feed = WeatherFeed(Country('Canada'), folder)
+    >>> feed.poll()
+    1
+    >>> with open(path, 'a') as f:
+    ...     _ = f.write(row.format(25) + row.format(26)[:20])
+    >>> feed.poll()
+    1
+    >>> feed.country.retrieve_history('YORK').contiguous_precipitation()
+    (datetime.date(2019, 12, 24), 2)
+    """
+    country: Country
+    folder_name: str
+    _columnar: bool
+    _offsets: Dict[str, int]
+    _histories: Dict[str, HistoricalWeather]
+
+    def __init__(self, country: Country, folder_name: str,
+                 columnar: bool = False, from_end: bool = False) -> None:
+        """Initialize this feed to add the weather in the data files in the
+        folder called folder_name to country. Nothing has been read yet.
+
+        If columnar is True, locations that are not already in country are
+        given columnar storage (see HistoricalWeather.__init__).
+
+        If from_end is True, the whole lines already in each file are treated
+        as read, so that only lines added from now on are read. Use this when
+        country was loaded from the same folder, for example by load_country.
+        Only the end of each file is looked at.
+
+        >>> import tempfile
+        >>> folder = tempfile.mkdtemp()
+        >>> path = os.path.join(folder, 'york.csv')
+        >>> row = ('79.5,43.7,YORK,1,,2019,12,{},,3,,-2,,0.5,,,,,,'
+        ...        '0,,1,,1,,,,,,,\\n')
+        >>> with open(path, 'w') as f:
+        ...     _ = f.write('header\\n' + row.format(24))
+        >>> canada = load_country(folder, 'Canada')
+        >>> feed = WeatherFeed(canada, folder, from_end=True)
+        >>> feed.poll()
+        0
+        >>> with open(path, 'a') as f:
+        ...     _ = f.write(row.format(25))
+        >>> feed.poll()
+        1
+        >>> canada.retrieve_history('YORK').contiguous_precipitation()
+        (datetime.date(2019, 12, 24), 2)
+        """
+        self.country = country
+        self.folder_name = folder_name
+        self._columnar = columnar
+        self._offsets = {}
+        self._histories = {}
+        if from_end:
+            for path in _station_files(folder_name):
+                self._offsets[path] = _whole_lines_size(path)
+
+    def poll(self) -> int:
+        """Read every whole line added to the data files in this feed's
+        folder since the last call, add the weather they record to this
+        feed's country, and return how many of them had no missing data.
+
+        The first call reads each file from the start, unless this feed was
+        created with from_end, as does the first call after a file first
+        appears. If a file has become shorter than
+        what was already read from it, it is read again from the start.
+
+        A file's rows are added to the location in the country with the name
+        given in its first row of data, following the same rules as
+        load_country and HistoricalWeather.add_weather: days already
+        recorded for a location are left as they are.
+        """
+        total = 0
+        for path in _station_files(self.folder_name):
+            total += self._poll_file(path)
+        return total
+
+    def _poll_file(self, path: str) -> int:
+        """Read the whole lines added to the data file at path since it was
+        last read, add their weather to this feed's country, and return how
+        many of them had no missing data.
+        """
+        offset = self._offsets.get(path, 0)
+        if os.path.getsize(path) < offset:
+            offset = 0
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        # Leave any partly written last line for the next call.
+        end = data.rfind(b'\n') + 1
+        self._offsets[path] = offset + end
+        lines = data[:end].decode(locale.getpreferredencoding(False))
+        rows = [row for row in csv.reader(lines.splitlines()) if row]
+        if offset == 0:
+            # Skip the header.
+            rows = rows[1:]
+        if not rows:
+            return 0
+
+        history = self._histories.get(path)
+        if history is None:
+            first = rows[0]
+            history = self.country.retrieve_history(first[STN_NAME])
+            if history is None:
+                history = HistoricalWeather(
+                    first[STN_NAME], (float(first[LAT]), float(first[LONG])),
+                    self._columnar)
+            self._histories[path] = history
+        days = history._extend(_read_days(rows))
+        if days > 0 and self.country.retrieve_history(history.name) is None:
+            self.country.add_history(history)
+        return days
+
+
+def _whole_lines_size(path: str) -> int:
+    """Return the number of bytes of the file at path up to and including
+    its last newline, or 0 if it has none.
+
+    Only the end of the file is read, a block at a time.
+    """
+    with open(path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline != -1:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def load_data(f: TextIO,
+              columnar: bool = False) -> Optional[HistoricalWeather]:
     """Return a HistoricalWeather record representing the weather data in the
     already open csv file f.
 
@@ -547,88 +2949,581 @@ def load_data(f: TextIO) -> Optional[HistoricalWeather]:
     in the file indicates that there were trace values. Record trace values
     as -1 in the corresponding attribute.
 
+    If columnar is True, the returned record uses columnar storage (see
+    HistoricalWeather.__init__).
+
     Preconditions:
         - f is open and is set to the beginning of the file.
         - The first line of f is a header, and the remaining lines
           follow the format specified in the handout.
         - There may be no lines of data, but there is at least a header.
+
+    >>> import io
+    >>> f = io.StringIO(
+    ...     'header\\n'
+    ...     '79.5,43.7,YORK,1,,2019,12,24,,3,,-2,,0.5,,,,,,0,,1,T,1,,,,,,,\\n'
+    ...     '79.5,43.7,YORK,1,,2019,12,25,,3,,-2,,0.5,,,,,,0,M,1,,1,,,,,,,\\n'
+    ...     '79.5,43.7,YORK,1,,2019,12,26,,,,-2,,0.5,,,,,,0,,1,,1,,,,,,,\\n')
+    >>> york = load_data(f)
+    >>> york.name, york.coordinates
+    ('YORK', (43.7, 79.5))
+    >>> print(york)
+    YORK (43.7, 79.5):
+    2019-12-24: Average: 0.5 Low: -2.0 High: 3.0 Precipitation: 1.0 \
+Snow: -1.0 Rain: 0.0
+    <BLANKLINE>
     """
-    f.readline()
-    line = f.readline()
-    if line == '':
+    reader = csv.reader(f)
+    next(reader, None)
+    first = next(reader, None)
+    if first is None:
         return None
-    lst = line.split(',')
-    loc = lst[STN_NAME]
-    coord = (float(lst[LAT]), float(lst[LONG]))
-    result = HistoricalWeather(loc, coord)
-    is_valid = False
-    while line != '':
-        new_lst = lst
-        if new_lst[TOTAL_RAIN_FLAG] == 'T':
-            new_lst[TOTAL_RAIN] = '-1'
-        elif new_lst[TOTAL_RAIN_FLAG] != '':
-            line = f.readline()
-            lst = line.split(',')
-            continue
-        if new_lst[TOTAL_SNOW_FLAG] == 'T':
-            new_lst[TOTAL_SNOW] = '-1'
-        elif new_lst[TOTAL_SNOW_FLAG] != '':
-            line = f.readline()
-            lst = line.split(',')
-            continue
-        if new_lst[TOTAL_PRECIP_FLAG] == 'T':
-            new_lst[TOTAL_PRECIP] = '-1'
-        elif new_lst[TOTAL_PRECIP_FLAG] != '':
-            line = f.readline()
-            lst = line.split(',')
+    result = HistoricalWeather(first[STN_NAME],
+                               (float(first[LAT]), float(first[LONG])),
+                               columnar)
+    profile = _active_profile.get()
+    if profile is None:
+        if result._extend(_read_days(chain([first], reader))) == 0:
+            return None
+        return result
+
+    # Finish each stage before starting the next, so each can be timed. Only
+    # a chunk of rows is held at a time, so that profiling does not change
+    # how much memory loading takes.
+    rows = chain([first], reader)
+    days = 0
+    while True:
+        start = time.perf_counter()
+        chunk = list(islice(rows, _PROFILE_CHUNK_ROWS))
+        profile.add_time('read_rows', time.perf_counter() - start)
+        if not chunk:
+            break
+        profile.count('rows_read', len(chunk))
+        start = time.perf_counter()
+        parsed = list(_read_days(chunk))
+        profile.add_time('parse_days', time.perf_counter() - start)
+        start = time.perf_counter()
+        days += result._extend(parsed)
+        profile.add_time('insert_days', time.perf_counter() - start)
+    if days == 0:
+        return None
+    return result
+
+
+def _read_days(rows: Iterable[List[str]]) -> Iterator[Tuple[date,
+                                                            DailyWeather]]:
+    """Yield the date and weather recorded in each of the rows of a data file
+    that has no missing data, in the order the rows appear.
+
+    Only the columns named in _PROJECT_ROW are looked at, and each row's
+    flags are checked before any of its values are converted.
+    """
+    project = _PROJECT_ROW
+    new_weather = DailyWeather.from_values
+    rejected_flag = 0
+    rejected_value = 0
+    for row in rows:
+        try:
+            (name, year, month, day, mean, low, high,
+             precip, precip_flag, rain, rain_flag,
+             snow, snow_flag) = project(row)
+        except IndexError:
+            # A blank or truncated line.
+            rejected_value += 1
             continue
-        if new_lst[STN_NAME] == '':
-            line = f.readline()
-            lst = line.split(',')
+        if (name == ''
+                or (rain_flag != '' and rain_flag != 'T')
+                or (snow_flag != '' and snow_flag != 'T')
+                or (precip_flag != '' and precip_flag != 'T')):
+            rejected_flag += 1
             continue
         try:
-            coord = (float(new_lst[LAT]), float(new_lst[LONG]))
-            date_ = date(int(new_lst[YEAR]), int(new_lst[MONTH]),
-                         int(new_lst[DAY]))
-            data = DailyWeather((float(new_lst[MEAN_TEMP]),
-                                 float(new_lst[MIN_TEMP]),
-                                 float(new_lst[MAX_TEMP])),
-                                (float(new_lst[TOTAL_PRECIP]),
-                                 float(new_lst[TOTAL_RAIN]),
-                                 float(new_lst[TOTAL_SNOW])))
-            result.add_weather(date_, data)
-            is_valid = True
+            date_ = date(int(year), int(month), int(day))
+            weather = new_weather(float(mean), float(low), float(high),
+                                  -1.0 if precip_flag else float(precip),
+                                  -1.0 if rain_flag else float(rain),
+                                  -1.0 if snow_flag else float(snow))
         except ValueError:
-            pass
-        line = f.readline()
-        lst = line.split(',')
-    if is_valid:
-        return result
-    else:
-        return None
+            # A missing value.
+            rejected_value += 1
+            continue
+        yield (date_, weather)
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.count('rows_rejected_flag', rejected_flag)
+        profile.count('rows_rejected_value', rejected_value)
 
 
-def load_country(folder_name: str, name: str) -> Country:
+def load_country(folder_name: str, name: str, workers: int = 1,
+                 columnar: bool = False,
+                 cache_dir: Optional[str] = None) -> Country:
     """ Return a Country called name that contains all the historical weather
      data stored in the files that are in the folder called folder_name.
 
+    If workers is more than 1, parse the files in a pool of that many
+    processes. Each process sends back its stations in columnar storage,
+    which is much cheaper to transfer than one DailyWeather per day.
+
+    If columnar is True, every location in the Country uses columnar
+    storage (see HistoricalWeather.__init__). Otherwise, with workers more
+    than 1, this process builds one DailyWeather per day from the columns it
+    is sent, which takes about half as long as parsing the files serially,
+    so loading can be at most about twice as fast however many workers
+    there are. Building them in the workers instead is slower still, since
+    pickling them costs more than building them. Use columnar storage to
+    get the full benefit of the workers.
+
+    If cache_dir is not None, keep a binary copy of each parsed file in the
+    folder called cache_dir, creating it if needed. A file whose size and
+    modification time match its cached copy is read from the cache instead
+    of being parsed again. Each cached copy is memory-mapped only while it
+    is read, so no file stays open once loading is done.
+
     Precondition:
     - Each file in the folder called folder_name:
         - is a .csv files that obeys the format specified in the handout
         - contains data for one location within this Country
+    - workers >= 1
+
+    >>> folder = os.path.join(os.path.dirname(__file__), 'student_data')
+    >>> serial = load_country(folder, 'Canada')
+    >>> parallel = load_country(folder, 'Canada', workers=2)
+    >>> list(parallel._location_names()) == list(serial._location_names())
+    True
+    >>> all(str(parallel.retrieve_history(name))
+    ...     == str(serial.retrieve_history(name))
+    ...     for name in serial._location_names())
+    True
+
+    The second time a file is loaded with the same cache_dir, it is read
+    from the cache; once it has changed, it is parsed again:
+
+    >>> import shutil
+    >>> import tempfile
+    >>> copy, cache = tempfile.mkdtemp(), tempfile.mkdtemp()
+    >>> _ = shutil.copy(os.path.join(folder, 'single_sample_data.csv'), copy)
+    >>> with Profile() as cold:
+    ...     _ = load_country(copy, 'Canada', cache_dir=cache)
+    >>> cold.counters.get('cache_hits', 0)
+    0
+    >>> with Profile() as warm:
+    ...     canada = load_country(copy, 'Canada', columnar=True,
+    ...                           cache_dir=cache)
+    >>> warm.counters['cache_hits']
+    1
+    >>> canada.retrieve_history('YORK').record_high(12, 25)
+    13.6
+    >>> with open(os.path.join(copy, 'single_sample_data.csv'), 'a') as f:
+    ...     _ = f.write('79.5,43.7,YORK,1,,2020,12,25,,20.5,,-2,,0.5,,,,,,'
+    ...                 '0,,1,,1,,,,,,,\\n')
+    >>> with Profile() as changed:
+    ...     canada = load_country(copy, 'Canada', cache_dir=cache)
+    >>> changed.counters.get('cache_hits', 0)
+    0
+    >>> canada.retrieve_history('YORK').record_high(12, 25)
+    20.5
+    >>> with Profile() as warm:
+    ...     canada = load_country(copy, 'Canada', cache_dir=cache)
+    >>> warm.counters['cache_hits']
+    1
+    >>> canada.retrieve_history('YORK').record_high(12, 25)
+    20.5
     """
+    start = time.perf_counter()
+    country = _load_country(folder_name, name, workers, columnar, cache_dir)
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.add_time('load_country', time.perf_counter() - start)
+        profile.count('stations_loaded', len(country._histories))
+    return country
+
+
+def _load_country(folder_name: str, name: str, workers: int, columnar: bool,
+                  cache_dir: Optional[str]) -> Country:
+    """Return the Country described in load_country.
+    """
+    country = Country(name)
+    paths = _station_files(folder_name)
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    if workers == 1:
+        for path in paths:
+            history = _load_station(path, columnar, cache_dir)
+            if history is not None:
+                country.add_history(history)
+        return country
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Results arrive in the order of paths, so that when two files hold
+        # the same location, the same one wins as when loading serially.
+        for history in pool.map(_load_station, paths, repeat(True),
+                                repeat(cache_dir),
+                                chunksize=max(1, len(paths) // (4 * workers))):
+            if history is None:
+                continue
+            if not columnar:
+                history = _history_from_columns(history.name,
+                                                history.coordinates,
+                                                history._to_columns(), False)
+            country.add_history(history)
+    return country
+
+
+async def load_country_async(folder_name: str, name: str,
+                             concurrency: int = 16, columnar: bool = False
+                             ) -> Tuple[Country, Dict[str, float]]:
+    """Return a Country called name that contains all the historical weather
+    data stored in the files that are in the folder called folder_name, as
+    load_country does, and the number of seconds each file took to read and
+    parse, keyed by its path.
+
+    Up to concurrency files are read at once, each in a thread of a pool of
+    concurrency threads that is shut down before returning, so that on a
+    slow file system the total time approaches that of the slowest file
+    rather than the sum over all files. Each file is parsed as soon as it
+    has been read, while others are still being read.
+
+    Run it with asyncio.run(load_country_async(folder_name, name)).
+
+    Precondition:
+    - concurrency >= 1
+    - the preconditions of load_country hold
+
+    >>> folder = os.path.join(os.path.dirname(__file__), 'student_data')
+    >>> canada, latencies = asyncio.run(load_country_async(folder, 'Canada'))
+    >>> canada.retrieve_history('YORK').record_high(12, 25)
+    13.6
+    >>> sorted(os.path.basename(path) for path in latencies)
+    ['empty_sample_data.csv', 'single_sample_data.csv', 'small_sample_data.csv']
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    # The default executor has too few threads to read concurrency files at
+    # once on a machine with few CPUs.
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    latencies = {}
+
+    async def load(path: str) -> Optional[HistoricalWeather]:
+        async with semaphore:
+            start = time.perf_counter()
+            text = await loop.run_in_executor(executor, _read_text, path)
+        history = load_data(io.StringIO(text), columnar)
+        latencies[path] = time.perf_counter() - start
+        return history
+
+    paths = _station_files(folder_name)
     country = Country(name)
-    for filename in os.listdir(folder_name):
-        # If there are any "dot files", ignore them.
-        if not filename.startswith('.'):
-            location_file = open(os.path.join(folder_name, filename), 'r')
-            history = load_data(location_file)
+    try:
+        # gather keeps the order of paths, so that when two files hold the
+        # same location, the same one wins as in load_country.
+        for history in await asyncio.gather(*(load(path) for path in paths)):
             if history is not None:
                 country.add_history(history)
+    finally:
+        executor.shutdown(wait=False)
+    return country, latencies
+
 
+def _read_text(path: str) -> str:
+    """Return the contents of the text file at path.
+    """
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def open_packed(filename: str) -> Country:
+    """Return the Country written to the file called filename by
+    Country.save_packed.
+
+    The file is memory-mapped rather than read: every location uses columnar
+    storage whose columns are views of the mapped file, so no per-day
+    objects are kept, and processes that open the same file share its
+    pages. A location's columns are copied into memory only if weather is
+    added to it.
+
+    Raise ValueError if the file was not written by Country.save_packed.
+
+    >>> import tempfile
+    >>> folder = os.path.join(os.path.dirname(__file__), 'student_data')
+    >>> canada = load_country(folder, 'Canada')
+    >>> path = os.path.join(tempfile.mkdtemp(), 'canada.bin')
+    >>> canada.save_packed(path)
+    >>> packed = open_packed(path)
+    >>> packed.name, list(packed._location_names())
+    ('Canada', ['THUNDER BAY', 'YORK'])
+    >>> packed.retrieve_history('YORK').record_high(12, 25)
+    13.6
+    >>> packed.snowiest_location() == canada.snowiest_location()
+    True
+    >>> with open(path, 'r+b') as f:
+    ...     _ = f.write(b'NOTPACKD')
+    >>> open_packed(path)  # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+    ...
+    ValueError: ... was not written by Country.save_packed
+
+    A file cut short also raises ValueError:
+
+    >>> canada.save_packed(path)
+    >>> with open(path, 'r+b') as f:
+    ...     _ = f.truncate(40)
+    >>> open_packed(path)  # doctest: +ELLIPSIS
+    Traceback (most recent call last):
+    ...
+    ValueError: ...
+    """
+    with open(filename, 'rb') as f:
+        packed = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = memoryview(packed)
+    if len(buffer) < _COUNTRY_HEADER.size:
+        raise ValueError(f'{filename} was not written by Country.save_packed')
+    magic, stations, name_length = _COUNTRY_HEADER.unpack_from(buffer, 0)
+    if magic != _COUNTRY_MAGIC:
+        raise ValueError(f'{filename} was not written by Country.save_packed')
+    offset = _COUNTRY_HEADER.size
+    if offset + name_length > len(buffer):
+        raise ValueError(f'{filename} is truncated')
+    country = Country(bytes(buffer[offset:offset + name_length]).decode())
+    offset += name_length
+    offset += _padding(offset)
+    for _ in range(stations):
+        name, coordinates, _, columns, offset = _read_station(buffer, offset,
+                                                              False)
+        country.add_history(_history_from_columns(name, coordinates, columns,
+                                                  True))
     return country
 
 
+def _grid_cell(lat: float, lon: float) -> Tuple[int, int]:
+    """Return the (row, column) of the cell of Country._grid holding
+    latitude lat and longitude lon.
+
+    >>> _grid_cell(43.7, -79.4)
+    (43, 280)
+    """
+    return (math.floor(lat / _GRID_DEGREES),
+            math.floor(lon / _GRID_DEGREES) % _GRID_COLUMNS)
+
+
+def _grid_ring(row: int, col: int, ring: int) -> List[Tuple[int, int]]:
+    """Return the cells of Country._grid that are exactly ring cells away
+    from the cell (row, col), counting diagonal steps as one cell.
+
+    Columns wrap around at longitude 180, and no cell is listed twice.
+
+    >>> sorted(_grid_ring(0, 0, 1))[:3]
+    [(-1, 0), (-1, 1), (-1, 359)]
+    """
+    if ring == 0:
+        return [(row, col)]
+    cells = set()
+    for c in range(col - ring, col + ring + 1):
+        cells.add((row - ring, c % _GRID_COLUMNS))
+        cells.add((row + ring, c % _GRID_COLUMNS))
+    for r in range(row - ring + 1, row + ring):
+        cells.add((r, (col - ring) % _GRID_COLUMNS))
+        cells.add((r, (col + ring) % _GRID_COLUMNS))
+    return list(cells)
+
+
+def _distance_outside_ring(lat: float, lon: float, row: int, col: int,
+                           ring: int) -> float:
+    """Return a lower bound, in km, on the great-circle distance from
+    latitude lat and longitude lon to any point outside the cells within ring
+    cells of the cell (row, col) that holds that point.
+    """
+    # Every point outside is either far enough north or south...
+    south = (row - ring) * _GRID_DEGREES
+    north = (row + ring + 1) * _GRID_DEGREES
+    lat_gap = math.inf
+    if south > -90:
+        lat_gap = lat - south
+    if north <= 90:
+        lat_gap = min(lat_gap, north - lat)
+    # ...or far enough east or west, though a degree of longitude is shorter
+    # away from the equator. Such a point is no closer than the meridian
+    # great circle that far away.
+    west = (math.floor(lon / _GRID_DEGREES) - ring) * _GRID_DEGREES
+    east = (math.floor(lon / _GRID_DEGREES) + ring + 1) * _GRID_DEGREES
+    lon_gap = min(lon - west, east - lon)
+    lon_bound = math.inf
+    if lon_gap < 180:
+        lon_bound = _EARTH_RADIUS_KM * math.asin(
+            min(1.0, abs(math.cos(math.radians(lat))
+                         * math.sin(math.radians(lon_gap)))))
+    return min(_EARTH_RADIUS_KM * math.radians(lat_gap), lon_bound)
+
+
+def _distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Return the great-circle distance, in km, between the two points at
+    these latitudes and longitudes.
+
+    >>> round(_distance_km(43.65, -79.38, 45.5, -73.57))
+    504
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    half_dphi = (phi2 - phi1) / 2
+    half_dlambda = math.radians(lon2 - lon1) / 2
+    a = (math.sin(half_dphi) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(half_dlambda) ** 2)
+    return 2 * _EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _station_files(folder_name: str) -> List[str]:
+    """Return the path of every data file in the folder called folder_name,
+    in the order os.listdir gives them.
+
+    Files whose names start with "." are ignored.
+    """
+    return [os.path.join(folder_name, filename)
+            for filename in os.listdir(folder_name)
+            if not filename.startswith('.')]
+
+
+def _file_source(path: str) -> Tuple[int, int]:
+    """Return the size and modification time (in ns) of the file at path.
+    """
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _load_station(path: str, columnar: bool, cache_dir: Optional[str] = None
+                  ) -> Optional[HistoricalWeather]:
+    """Return the HistoricalWeather stored in the data file at path, as
+    load_data does, closing the file before returning.
+
+    If cache_dir is not None, use and refresh the cached copy of the file in
+    that folder, as described in load_country.
+    """
+    if cache_dir is None:
+        with open(path, 'r') as location_file:
+            return load_data(location_file, columnar)
+
+    source = _file_source(path)
+    cache_file = os.path.join(
+        cache_dir,
+        hashlib.sha1(os.path.abspath(path).encode()).hexdigest() + '.bin')
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        # The file has not been cached yet.
+        cached = None
+    except ValueError:
+        # The cached copy is empty, so it cannot be mapped.
+        cached = None
+    if cached is not None:
+        # The columns are copied out of the mapping, which is closed before
+        # returning, so that no file descriptor is kept open per station.
+        with cached, memoryview(cached) as buffer:
+            try:
+                name, coordinates, cached_source, columns, _ = _read_station(
+                    buffer, 0)
+            except ValueError:
+                # The cached copy is damaged.
+                cached_source = None
+        if cached_source == source:
+            profile = _active_profile.get()
+            if profile is not None:
+                profile.count('cache_hits')
+            if len(columns) == 0:
+                return None
+            return _history_from_columns(name, coordinates, columns, columnar)
+
+    with open(path, 'r') as location_file:
+        history = load_data(location_file, columnar)
+    # Write to a temporary file first, so that a process reading the cache
+    # never sees a partly written copy.
+    temp_file = f'{cache_file}.{os.getpid()}.tmp'
+    with open(temp_file, 'wb') as f:
+        if history is None:
+            _write_station(f, '', (0.0, 0.0), _WeatherColumns(), source)
+        else:
+            _write_station(f, history.name, history.coordinates,
+                           history._to_columns(), source)
+    os.replace(temp_file, cache_file)
+    return history
+
+
+def _history_from_columns(name: str, coordinates: Tuple[float, float],
+                          columns: _WeatherColumns,
+                          columnar: bool) -> HistoricalWeather:
+    """Return a HistoricalWeather for the place with this name and these
+    coordinates, holding the daily weather in columns.
+
+    If columnar is True, the new HistoricalWeather takes columns as its
+    storage, so the caller must not change them afterwards.
+    """
+    history = HistoricalWeather(name, coordinates, columnar)
+    if columnar:
+        history._use_columns(columns)
+    else:
+        history._extend(columns.items())
+    return history
+
+
+def _write_station(f: BinaryIO, name: str, coordinates: Tuple[float, float],
+                   columns: _WeatherColumns, source: Tuple[int, int]) -> None:
+    """Write the place with this name and coordinates, and the daily weather
+    in columns, to the binary file f at its current position.
+
+    source is the size and modification time (in ns) of the data file the
+    place was read from.
+
+    The header is followed by the name and then each column in turn, with
+    every part starting a multiple of 8 bytes from the start of the header,
+    so that the columns can be read straight out of a memory-mapped file.
+    Numbers are in this machine's native byte order.
+
+    Precondition: f is positioned a multiple of 8 bytes from its start.
+    """
+    encoded = name.encode('utf-8')
+    f.write(_STATION_HEADER.pack(_STATION_MAGIC, source[0], source[1],
+                                 coordinates[0], coordinates[1],
+                                 len(columns), len(encoded)))
+    f.write(encoded + bytes(_padding(len(encoded))))
+    columns.ordinals.tofile(f)
+    f.write(bytes(_padding(columns.ordinals.itemsize * len(columns))))
+    for column in _COLUMN_NAMES:
+        getattr(columns, column).tofile(f)
+
+
+def _read_station(buffer: memoryview, offset: int, copy: bool = True) -> \
+        Tuple[str, Tuple[float, float], Tuple[int, int], _WeatherColumns, int]:
+    """Return the name, coordinates, source size and modification time, and
+    daily weather of the place written by _write_station at offset in buffer,
+    along with the offset just past it.
+
+    If copy is False, the daily weather is left in buffer rather than copied
+    (see _WeatherColumns.from_buffer).
+
+    Raise ValueError if there is no such place at offset.
+    """
+    if offset + _STATION_HEADER.size > len(buffer):
+        raise ValueError('station header is truncated')
+    (magic, size, mtime, lat, lon,
+     rows, name_length) = _STATION_HEADER.unpack_from(buffer, offset)
+    if magic != _STATION_MAGIC:
+        raise ValueError('not a station written by _write_station')
+    offset += _STATION_HEADER.size
+    if offset + name_length > len(buffer):
+        raise ValueError('station name is truncated')
+    name = bytes(buffer[offset:offset + name_length]).decode('utf-8')
+    offset += name_length + _padding(name_length)
+    columns, offset = _WeatherColumns.from_buffer(buffer, offset, rows, copy)
+    return (name, (lat, lon), (size, mtime), columns, offset)
+
+
+def _padding(length: int) -> int:
+    """Return how many bytes must follow the first length bytes of a file to
+    reach a multiple of 8 bytes.
+
+    >>> _padding(8), _padding(13)
+    (0, 3)
+    """
+    return -length % 8
+
+
 def helper_get_average(a: list[float]) -> Union[float, None]:
     """A helper function that gives the average of a list of integers.
     return None if the length of the list is zero.
@@ -642,9 +3537,19 @@ def helper_get_average(a: list[float]) -> Union[float, None]:
 if __name__ == '__main__':
     import python_ta
     python_ta.check_all(config={
-        'allowed-io': ['load_country', 'generate_summary'],
+        'allowed-io': ['load_country', 'generate_summary', '_load_station',
+                       'Country.save_packed', 'open_packed',
+                       'WeatherFeed._poll_file', 'Country.write_summary',
+                       'LazyCountry.__init__', '_read_text',
+                       '_whole_lines_size'],
         'allowed-import-modules': ['doctest', 'python_ta', 'typing',
-                                   'datetime', 'os'],
+                                   'datetime', 'os', 'bisect',
+                                   'heapq', 'array', 'csv', 'itertools',
+                                   'operator', 'concurrent.futures',
+                                   'hashlib', 'struct', 'mmap', 'math',
+                                   'locale', 'collections', 'json',
+                                   'time', 'threading',
+                                   'asyncio', 'io', 'contextvars'],
         'disable': ['E1136'],
         'max-attributes': 15,
     })
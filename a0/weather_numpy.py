@@ -0,0 +1,322 @@
+"""Assignment 0 - NumPy statistics for weather histories
+
+CSC148, Winter 2021
+
+This code is provided solely for the personal and private use of
+students taking the CSC148 course at the University of Toronto.
+Copying for purposes other than this use is expressly prohibited.
+All forms of distribution of this code, whether as given or with
+any changes, are expressly prohibited.
+
+Authors: Diane Horton, Ian Berlott-Atwell, Jonathan Calver,
+Sophia Huynh, Maryam Majedi, and Jaisie Sin.
+
+All of the files in this directory and all subdirectories are:
+Copyright (c) 2021 Diane Horton, Ian Berlott-Atwell, Jonathan Calver,
+Sophia Huynh, Maryam Majedi, and Jaisie Sin.
+
+===== Module Description =====
+
+This module computes the same statistics as the methods of HistoricalWeather
+and Country in weather.py, using vectorized NumPy operations on copies of the
+histories held in arrays. It is optional: weather.py does not need NumPy, and
+this module can only be imported where NumPy is installed.
+"""
+from datetime import date
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from weather import Country, HistoricalWeather
+
+# The ordinal (as given by date.toordinal) of the NumPy datetime64 epoch.
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+_MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
+                'Oct', 'Nov', 'Dec']
+
+
+class ArrayStatistics:
+    """Statistics about the weather recorded at one place, computed with
+    NumPy.
+
+    The place's history is converted to arrays once, when this object is
+    created, so later weather added to the history is not reflected here.
+
+    === Attributes ===
+    name: The name of the place.
+
+    === Private Attributes ===
+    _ordinals: The ordinal (as given by date.toordinal) of each recorded day,
+        in increasing order.
+    _months, _days: The month (1-12) and day of the month of each recorded
+        day.
+    _low, _high, _precipitation, _rainfall, _snowfall: The DailyWeather
+        attribute of the same name for each recorded day.
+    _record_highs: The highest temperature recorded on each month and day,
+        indexed by month and then day, or -inf if that day was never
+        recorded.
+
+    === Representation Invariants ===
+    - All of the private arrays have the same length, which is at least 1.
+
+    === Sample Usage ===
+    >>> from weather import DailyWeather
+    >>> toronto_weather = HistoricalWeather('Toronto', (43.6529, -79.3849))
+    >>> toronto_weather.add_weather(date(2019, 6, 8),
+    ...                             DailyWeather((13, 10, 30), (1, 0, 1)))
+    >>> toronto_weather.add_weather(date(2020, 6, 8),
+    ...                             DailyWeather((13, 0, 40), (3, 3, 0)))
+    >>> stats = ArrayStatistics(toronto_weather)
+    >>> stats.record_high(6, 8)
+    40.0
+    >>> stats.monthly_average()['Jun']
+    5.0
+    >>> stats.percentage_snowfall()
+    0.25
+    """
+    name: str
+    _ordinals: np.ndarray
+    _months: np.ndarray
+    _days: np.ndarray
+    _low: np.ndarray
+    _high: np.ndarray
+    _precipitation: np.ndarray
+    _rainfall: np.ndarray
+    _snowfall: np.ndarray
+    _record_highs: np.ndarray
+
+    def __init__(self, history: HistoricalWeather) -> None:
+        """Initialize these statistics with the weather recorded so far in
+        history.
+
+        Precondition: At least one day's weather has been recorded in
+            history.
+        """
+        self.name = history.name
+        (self._ordinals, self._months, self._days, self._low, self._high,
+         self._precipitation, self._rainfall,
+         self._snowfall) = _history_arrays(history)
+        self._record_highs = np.full((13, 32), -np.inf)
+        np.maximum.at(self._record_highs, (self._months, self._days),
+                      self._high)
+
+    def record_high(self, m: int, d: int) -> float:
+        """Return the highest temperature recorded on month m and day d in
+        any year.
+
+        Preconditions: as for HistoricalWeather.record_high
+        """
+        return float(self._record_highs[m, d])
+
+    def monthly_average(self) -> Dict[str, Optional[float]]:
+        """Return the average minimum temperature for each month, as
+        HistoricalWeather.monthly_average does.
+        """
+        totals = np.bincount(self._months, weights=self._low, minlength=13)
+        counts = np.bincount(self._months, minlength=13)
+        result = {}
+        for m in range(1, 13):
+            if counts[m] == 0:
+                result[_MONTH_NAMES[m - 1]] = None
+            else:
+                result[_MONTH_NAMES[m - 1]] = float(totals[m] / counts[m])
+        return result
+
+    def precipitation_streaks(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the start ordinals and lengths of every maximal sequence
+        of consecutive days that had precipitation, oldest first.
+
+        A day had precipitation as defined in
+        HistoricalWeather.contiguous_precipitation.
+
+        >>> from weather import DailyWeather
+        >>> wet = DailyWeather((0, 0, 0), (1, 0, 0))
+        >>> dry = DailyWeather((0, 0, 0), (0, 0, 0))
+        >>> history = HistoricalWeather('Toronto', (43.6529, -79.3849))
+        >>> for day, w in [(1, wet), (2, wet), (3, dry), (4, wet), (6, wet)]:
+        ...     history.add_weather(date(2020, 7, day), w)
+        >>> starts, lengths = ArrayStatistics(history).precipitation_streaks()
+        >>> [str(date.fromordinal(int(start))) for start in starts]
+        ['2020-07-01', '2020-07-04', '2020-07-06']
+        >>> lengths.tolist()
+        [2, 1, 1]
+        """
+        wet = self._ordinals[self._precipitation != 0]
+        if wet.size == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return (empty, empty)
+        # Two wet days are in the same sequence exactly when their ordinals
+        # differ by one, since the ordinals are distinct and sorted.
+        breaks = np.flatnonzero(np.diff(wet) != 1)
+        starts = np.concatenate(([0], breaks + 1))
+        ends = np.concatenate((breaks + 1, [wet.size]))
+        return (wet[starts], ends - starts)
+
+    def contiguous_precipitation(self) -> Tuple[date, int]:
+        """Return the start date and length of the longest sequence of
+        consecutive days that had precipitation, as
+        HistoricalWeather.contiguous_precipitation does.
+        """
+        starts, lengths = self.precipitation_streaks()
+        if lengths.size == 0:
+            return (date.fromordinal(int(self._ordinals[0])), 0)
+        # argmax returns the first of any tied streaks, as the loop does.
+        longest = int(np.argmax(lengths))
+        return (date.fromordinal(int(starts[longest])), int(lengths[longest]))
+
+    def percentage_snowfall(self) -> float:
+        """Return the fraction of the snowfall and rainfall that was
+        snowfall, as HistoricalWeather.percentage_snowfall does.
+        """
+        snow = float(self._snowfall[self._snowfall != -1].sum())
+        rain = float(self._rainfall[self._rainfall != -1].sum())
+        return snow / (snow + rain)
+
+
+class CountryStatistics:
+    """Statistics about every location in a Country, computed with NumPy in
+    one pass over all of their weather at once.
+
+    The weather of every location is stacked into one set of arrays when
+    this object is created, with a station index per day, so the cost of
+    each statistic grows with the number of days recorded rather than with
+    the number of locations. Weather added to the Country later is not
+    reflected here.
+
+    === Attributes ===
+    names: The name of each location, in the order the locations were added
+        to the Country.
+
+    === Private Attributes ===
+    _stations: The index into names of the location of each recorded day.
+    _months, _days, _low, _high, _rainfall, _snowfall: The month, day of
+        the month and DailyWeather attributes of each recorded day, as in
+        ArrayStatistics.
+
+    === Representation Invariants ===
+    - All of the private arrays have the same length.
+
+    === Sample Usage ===
+    >>> from weather import DailyWeather
+    >>> toronto_weather = HistoricalWeather('YYZ', (43.6529, -79.3849))
+    >>> mtl_weather = HistoricalWeather('Montreal', (45.47, -73.74))
+    >>> toronto_weather.add_weather(date(2020, 12, 25),
+    ...                             DailyWeather((13, 9, 20), (5, 2, 3)))
+    >>> mtl_weather.add_weather(date(2020, 12, 25),
+    ...                         DailyWeather((13, 4, 20), (5, 2, 2)))
+    >>> canada = Country('Canada')
+    >>> canada.add_history(toronto_weather)
+    >>> canada.add_history(mtl_weather)
+    >>> stats = CountryStatistics(canada)
+    >>> stats.snowiest_location()
+    ('YYZ', 0.6)
+    >>> stats.monthly_averages(12)
+    {'YYZ': 9.0, 'Montreal': 4.0}
+    >>> stats.record_highs(12, 25)
+    {'YYZ': 20.0, 'Montreal': 20.0}
+    """
+    names: List[str]
+    _stations: np.ndarray
+    _months: np.ndarray
+    _days: np.ndarray
+    _low: np.ndarray
+    _high: np.ndarray
+    _rainfall: np.ndarray
+    _snowfall: np.ndarray
+
+    def __init__(self, country: Country) -> None:
+        """Initialize these statistics with the weather recorded so far at
+        every location in country.
+        """
+        self.names = []
+        parts = []
+        for name in list(country._location_names()):
+            history = country.retrieve_history(name)
+            if history is not None:
+                self.names.append(name)
+                parts.append(_history_arrays(history))
+        lengths = [len(part[0]) for part in parts]
+        self._stations = np.repeat(np.arange(len(parts)), lengths)
+        if parts:
+            stacked = [np.concatenate(column) for column in zip(*parts)]
+        else:
+            stacked = [np.zeros(0, dtype=np.int64)] * 8
+        (_, self._months, self._days, self._low, self._high, _,
+         self._rainfall, self._snowfall) = stacked
+
+    def snowiest_location(self) -> Union[Tuple[str, float],
+                                         Tuple[None, None]]:
+        """Return the name and percentage snowfall of the location with the
+        highest percentage snowfall, as Country.snowiest_location does.
+        """
+        if not self.names:
+            return (None, None)
+        stations = len(self.names)
+        snow = np.bincount(self._stations, minlength=stations,
+                           weights=np.where(self._snowfall == -1, 0.0,
+                                            self._snowfall))
+        rain = np.bincount(self._stations, minlength=stations,
+                           weights=np.where(self._rainfall == -1, 0.0,
+                                            self._rainfall))
+        percentages = snow / (snow + rain)
+        # Country.snowiest_location keeps the last of any tied locations.
+        snowiest = stations - 1 - int(np.argmax(percentages[::-1]))
+        return (self.names[snowiest], float(percentages[snowiest]))
+
+    def monthly_averages(self, month: int) -> Dict[str, Optional[float]]:
+        """Return, for each location, the average minimum temperature in
+        month (1-12) in any year, or None if that location has no weather
+        recorded in that month.
+        """
+        in_month = self._months == month
+        stations = len(self.names)
+        totals = np.bincount(self._stations[in_month], minlength=stations,
+                             weights=self._low[in_month])
+        counts = np.bincount(self._stations[in_month], minlength=stations)
+        return {name: (float(totals[i] / counts[i]) if counts[i] else None)
+                for i, name in enumerate(self.names)}
+
+    def record_highs(self, m: int, d: int) -> Dict[str, Optional[float]]:
+        """Return, for each location, the highest temperature recorded on
+        month m and day d in any year, or None if that location has no
+        weather recorded on that day.
+        """
+        on_day = (self._months == m) & (self._days == d)
+        highs = np.full(len(self.names), -np.inf)
+        np.maximum.at(highs, self._stations[on_day], self._high[on_day])
+        return {name: (float(highs[i]) if highs[i] != -np.inf else None)
+                for i, name in enumerate(self.names)}
+
+
+def _history_arrays(history: HistoricalWeather) -> Tuple[np.ndarray, ...]:
+    """Return copies of the ordinal, month, day, low_temp, high_temp,
+    precipitation, rainfall and snowfall of every day recorded in history,
+    as arrays, in date order.
+    """
+    columns = history._to_columns()
+    # np.array copies, so these arrays do not change if history does.
+    ordinals = np.array(columns.ordinals, dtype=np.int64)
+    days = (ordinals - _EPOCH_ORDINAL).astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    return (ordinals,
+            months.astype(np.int64) % 12 + 1,
+            (days - months).astype(np.int64) + 1,
+            np.array(columns.low_temp, dtype=np.float64),
+            np.array(columns.high_temp, dtype=np.float64),
+            np.array(columns.precipitation, dtype=np.float64),
+            np.array(columns.rainfall, dtype=np.float64),
+            np.array(columns.snowfall, dtype=np.float64))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'allowed-import-modules': ['doctest', 'python_ta', 'typing',
+                                   'datetime', 'numpy', 'weather'],
+        'max-attributes': 10,
+        'disable': ['E1136', 'W0212'],
+    })
+
+    import doctest
+    doctest.testmod()